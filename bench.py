@@ -0,0 +1,507 @@
+#!/usr/bin/python3
+"""
+Benchmarks for mazelib.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+
+import numpy
+
+import mazelib
+
+# Version of the results files written by --save.
+RESULTS_VERSION = 1
+
+# Short measurements are repeated for at least this many seconds.
+MIN_REPEAT_TIME = 0.5
+
+# Peak memory below this isn't compared, since small allocations vary from
+# run to run.
+MIN_COMPARED_BYTES = 1 << 20
+
+# How much higher a scaling exponent can get before it counts as a
+# regression. An extra factor of size is +1.
+SCALING_SLACK = 0.25
+
+# Measurements that look slower with --compare are taken again, up to this
+# many times, keeping the fastest. A busy machine can have slow spells that
+# last longer than a whole measurement.
+RECHECKS = 3
+
+
+benchmarks = {}
+def register_benchmark(func):
+    name = func.__name__
+    assert name.startswith("bench_")
+    benchmarks[name[len("bench_"):]] = func
+    return func
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def best_time(func, repeat):
+    """
+    Fastest of `repeat` runs of `func()`, or of as many as fit in
+    MIN_REPEAT_TIME if that is more, since short runs vary more. Stops after
+    one run if it takes over a second.
+    """
+    best = math.inf
+    runs = total = 0
+    while runs < repeat or total < MIN_REPEAT_TIME:
+        t = time_call(func)
+        best = min(best, t)
+        runs += 1
+        total += t
+        if t > 1:
+            break
+    return best
+
+def peak_memory(func):
+    """Peak bytes allocated by Python and numpy while running `func()`."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def scaling_exponent(sizes, times):
+    """
+    Least squares slope of log(time) against log(size). 1.0 means linear
+    growth, 2.0 quadratic.
+    """
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(t) for t in times]
+    x_mean = sum(xs) / len(xs)
+    y_mean = sum(ys) / len(ys)
+    num = sum((x-x_mean)*(y-y_mean) for x, y in zip(xs, ys))
+    den = sum((x-x_mean)**2 for x in xs)
+    return num / den
+
+def print_scaling(sizes, times):
+    print("{:>10} {:>10} {:>12}".format("cells", "seconds", "cells/sec"))
+    for size, t in zip(sizes, times):
+        print("{:>10} {:>10.3f} {:>12.0f}".format(size, t, size/t))
+    if len(sizes) > 1:
+        print("scaling exponent: {:.2f}".format(scaling_exponent(sizes, times)))
+
+def square_sides(max_cells):
+    """Side lengths of square mazes with 10^4, 10^5, ... up to max_cells."""
+    sides = []
+    cells = 10**4
+    while cells <= max_cells:
+        sides.append(round(math.sqrt(cells)))
+        cells *= 10
+    return sides
+
+
+@register_benchmark
+def bench_kruskal(args):
+    """Kruskal generation on square RectMazes."""
+    sizes, times = [], []
+    for side in square_sides(args.max_cells):
+        m = mazelib.RectMaze(side, side)
+        gen = mazelib.generators["kruskal"](m)
+        sizes.append(side*side)
+        times.append(time_call(gen.generate))
+    print_scaling(sizes, times)
+
+@register_benchmark
+def bench_one_pass(args):
+    """Array-at-a-time generators on square RectMazes."""
+    for name in ("binary_tree", "sidewinder"):
+        print(name)
+        sizes, times = [], []
+        for side in square_sides(args.max_cells):
+            gen = mazelib.generators[name](mazelib.RectMaze(side, side))
+            sizes.append(side*side)
+            times.append(time_call(gen.generate))
+        print_scaling(sizes, times)
+
+
+def reference_rect_to_str(m):
+    """
+    The original per-corner RectMaze renderer, kept as a baseline to compare
+    the vectorized one against.
+    """
+    s = []
+    for y in range(-1, m.height):
+        for x in range(-1, m.width):
+            a = 0
+            if m.in_bounds(x, y):
+                if m._cells[x,y] & m.E: a |= m.N
+                if m._cells[x,y] & m.S: a |= m.W
+            if m.in_bounds(x+1, y):
+                if m._cells[x+1,y] & m.W: a |= m.N
+                if m._cells[x+1,y] & m.S: a |= m.E
+            if m.in_bounds(x, y+1):
+                if m._cells[x,y+1] & m.E: a |= m.S
+                if m._cells[x,y+1] & m.N: a |= m.W
+            if m.in_bounds(x+1, y+1):
+                if m._cells[x+1,y+1] & m.W: a |= m.S
+                if m._cells[x+1,y+1] & m.N: a |= m.E
+            s.append(m.WALL_CHARS[a])
+        s.append("\n")
+    return ''.join(s[:-1])
+
+@register_benchmark
+def bench_rect_to_str(args):
+    """RectMaze.to_str against the per-corner reference renderer."""
+    print("{:>8} {:>12} {:>12} {:>8}".format("size", "reference", "to_str", "speedup"))
+    for side in (50, 100, 200, 500):
+        m = mazelib.RectMaze(side, side)
+        mazelib.generators["kruskal"](m).generate()
+        assert m.to_str() == reference_rect_to_str(m)
+        t_ref = time_call(reference_rect_to_str, m)
+        t_new = time_call(m.to_str)
+        print("{:>8} {:>12.4f} {:>12.4f} {:>7.0f}x".format(
+            "{0}x{0}".format(side), t_ref, t_new, t_ref/t_new
+        ))
+
+
+@register_benchmark
+def bench_backtrack_step(args):
+    """Per-step cost of Backtrack, which should not grow with maze size."""
+    print("{:>8} {:>10} {:>10} {:>10}".format("type", "cells", "steps", "us/step"))
+    for name, maze_cls in mazelib.maze_types.items():
+        for side in square_sides(args.max_cells):
+            gen = mazelib.generators["backtrack"](maze_cls(side, side))
+            start = time.perf_counter()
+            steps = sum(1 for m in gen.iter_steps())
+            t = time.perf_counter() - start
+            print("{:>8} {:>10} {:>10} {:>10.2f}".format(
+                name, side*side, steps, t/steps*1e6
+            ))
+
+@register_benchmark
+def bench_step_batch(args):
+    """Cost of iter_steps() against the number of steps per batch."""
+    print("{:>12} {:>8} {:>10}".format("algorithm", "batch", "us/cell"))
+    for name in ("backtrack", "kruskal"):
+        for batch in (1, 16, 1024):
+            m = mazelib.RectMaze(300, 300)
+            gen = mazelib.generators[name](m)
+            start = time.perf_counter()
+            for m in gen.iter_steps(batch):
+                pass
+            t = time.perf_counter() - start
+            print("{:>12} {:>8} {:>10.2f}".format(name, batch, t/m.cell_count()*1e6))
+
+@register_benchmark
+def bench_side_lookup(args):
+    """
+    Per-call cost of side membership and side wall lookups. Fails if it grows
+    with maze size, which would mean a scan over the side.
+    """
+    ok = True
+    print("{:>8} {:>10} {:>10}".format("type", "cells", "us/call"))
+    for name, maze_cls in mazelib.maze_types.items():
+        sides, times = [], []
+        for side in (10, 100, 1000):
+            m = maze_cls(side, side)
+            cells = [(x, side-1) for x in range(0, side, max(side//10, 1))]
+            calls = 10000 // len(cells)
+            def lookups():
+                for _ in range(calls):
+                    for cell_id in cells:
+                        m.cell_is_on_side(cell_id, m.default_exit_side)
+                        m.cell_get_side_wall(cell_id, m.default_exit_side)
+            # Build the maze's lazily built tables first, so only the
+            # lookups are timed.
+            m.cell_is_on_side(cells[0], m.default_exit_side)
+            m.cell_get_side_wall(cells[0], m.default_exit_side)
+            t = time_call(lookups) / (calls*len(cells)*2)
+            sides.append(side)
+            times.append(t)
+            print("{:>8} {:>10} {:>10.2f}".format(name, side*side, t*1e6))
+        exponent = scaling_exponent(sides, times)
+        print("{:>8} scaling exponent against side length: {:.2f}".format(name, exponent))
+        if exponent > 0.5:
+            print("FAIL: {} side lookups scale with maze size".format(name))
+            ok = False
+    return ok
+
+@register_benchmark
+def bench_solve(args):
+    """Solving and farthest cell search on Kruskal mazes."""
+    print("{:>8} {:>10} {:>10} {:>10}".format("type", "cells", "solve", "farthest"))
+    for name, maze_cls in mazelib.maze_types.items():
+        for side in square_sides(args.max_cells):
+            m = maze_cls(side, side)
+            mazelib.generators["kruskal"](m).generate()
+            t_solve = time_call(mazelib.solve.solve, m)
+            t_farthest = time_call(mazelib.solve.farthest, m, m.entrance[0])
+            print("{:>8} {:>10} {:>10.3f} {:>10.3f}".format(
+                name, side*side, t_solve, t_farthest
+            ))
+
+@register_benchmark
+def bench_grid_types(args):
+    """Generation and rendering time of each maze type at the same size."""
+    print("{:>8} {:>12} {:>12}".format("type", "backtrack", "to_str"))
+    for name, maze_cls in mazelib.maze_types.items():
+        m = maze_cls(100, 100)
+        t_gen = time_call(mazelib.generators["backtrack"](m).generate)
+        t_str = time_call(m.to_str)
+        print("{:>8} {:>12.4f} {:>12.4f}".format(name, t_gen, t_str))
+
+@register_benchmark
+def bench_batch(args):
+    """generate_many throughput against number of workers."""
+    count = 400
+    print("{:>8} {:>12}".format("workers", "mazes/sec"))
+    for workers in (1, 2, 4, 8):
+        t = time_call(mazelib.generate_many, "rect", "backtrack", 30, 30, count,
+                      args.seed, workers)
+        print("{:>8} {:>12.1f}".format(workers, count/t))
+
+@register_benchmark
+def bench_tiled(args):
+    """generate_tiled time for one large maze against number of workers."""
+    side = round(math.sqrt(args.max_cells))
+    print("{} cells".format(side*side))
+    print("{:>8} {:>10} {:>12}".format("workers", "seconds", "cells/sec"))
+    for workers in (1, 2, 4, 8):
+        t = time_call(mazelib.generate_tiled, "sidewinder", side, side, 512,
+                      args.seed, workers)
+        print("{:>8} {:>10.3f} {:>12.0f}".format(workers, t, side*side/t))
+
+@register_benchmark
+def bench_analyze(args):
+    """analyze_many throughput on a batch of 30x30 mazes of each type."""
+    count = 2000
+    print("{:>8} {:>12} {:>12}".format("type", "mazes/sec", "cells/sec"))
+    for name in mazelib.maze_types:
+        cells = mazelib.generate_many(name, "kruskal", 30, 30, count, args.seed)
+        t = time_call(mazelib.analyze.analyze_many, name, cells)
+        print("{:>8} {:>12.0f} {:>12.0f}".format(name, count/t, count*900/t))
+
+@register_benchmark
+def bench_world(args):
+    """MazeWorld chunks at random coordinates, near and far, uncached."""
+    rng = random.Random(args.seed)
+    print("{:>8} {:>12} {:>12}".format("spread", "chunks/sec", "cells/sec"))
+    for spread in (10, 10**6, 10**18):
+        world = mazelib.MazeWorld(seed=args.seed, max_bytes=0)
+        coords = [(rng.randint(-spread, spread), rng.randint(-spread, spread))
+                  for _ in range(50)]
+        t = time_call(lambda: [world.chunk(cx, cy) for cx, cy in coords])
+        print("{:>8.0e} {:>12.1f} {:>12.0f}".format(
+            spread, len(coords)/t, len(coords)*world.chunk_size**2/t
+        ))
+
+
+########## Sweep ##########
+
+# Measurements recorded by bench_sweep(), saved by --save and checked by
+# --compare. Keys are like "generate/kruskal/rect" and "to_str/rect", and
+# each holds a list of measurements, one per maze size.
+results = {}
+
+# The function each measurement timed, by (key, cells), for re-measuring.
+measured_funcs = {}
+
+def measure(key, n_cells, func, args):
+    """Times `func()`, measures its peak memory and records both in `results`."""
+    t = best_time(func, args.repeat)
+    peak = peak_memory(func)
+    results.setdefault(key, []).append({
+        "cells": n_cells,
+        "seconds": t,
+        "cells_per_sec": n_cells / t,
+        "peak_bytes": peak,
+    })
+    measured_funcs[key, n_cells] = func
+    print("{:<34} {:>10} {:>10.4f} {:>12.0f} {:>10.1f}".format(
+        key, n_cells, t, n_cells/t, peak / 2**20
+    ))
+
+@register_benchmark
+def bench_sweep(args):
+    """
+    Every generator on every maze type it supports, and to_str and to_img
+    for each maze type, over square mazes of 10^4 cells up to --max-cells.
+    """
+    print("{:<34} {:>10} {:>10} {:>12} {:>10}".format(
+        "", "cells", "seconds", "cells/sec", "peak MiB"
+    ))
+    for type_name, maze_cls in mazelib.maze_types.items():
+        for gen_name, gen_cls in mazelib.generators.items():
+            if gen_cls.supported_maze_types is not None and \
+                    type_name not in gen_cls.supported_maze_types:
+                continue
+            for side in square_sides(args.max_cells):
+                # Defaults bind this loop's values, for re-measuring later.
+                def generate(maze_cls=maze_cls, gen_cls=gen_cls, side=side):
+                    m = maze_cls(side, side)
+                    gen_cls(m, rng=random.Random(args.seed)).generate()
+                measure("generate/{}/{}".format(gen_name, type_name),
+                        side*side, generate, args)
+
+        for side in square_sides(args.max_cells):
+            m = maze_cls(side, side)
+            mazelib.generators["kruskal"](m, rng=random.Random(args.seed)).generate()
+            def to_img(m=m):
+                with open(os.devnull, "wb") as devnull:
+                    m.to_img(devnull, cell_size=4)
+            measure("to_str/{}".format(type_name), side*side, m.to_str, args)
+            measure("to_img/{}".format(type_name), side*side, to_img, args)
+
+    print()
+    for key, series in results.items():
+        if len(series) > 1:
+            exponent = scaling_exponent([r["cells"] for r in series],
+                                        [r["seconds"] for r in series])
+            print("{:<34} scaling exponent {:.2f}".format(key, exponent))
+
+def save_results(path, args):
+    with open(path, "w") as f:
+        json.dump({
+            "version": RESULTS_VERSION,
+            "python": platform.python_version(),
+            "numpy": numpy.__version__,
+            "machine": platform.machine(),
+            "max_cells": args.max_cells,
+            "results": results,
+        }, f, indent=1)
+
+def compare_results(path, threshold, repeat):
+    """
+    Compares `results` against the ones saved in `path`. Returns a list of
+    regressions: throughput or peak memory worse by more than `threshold`
+    (a fraction), or a scaling exponent up by more than SCALING_SLACK.
+    Measurements that look slower are retaken first (see RECHECKS).
+    """
+    with open(path) as f:
+        saved = json.load(f)
+    if saved.get("version") != RESULTS_VERSION:
+        sys.exit("Unsupported results version in {}".format(path))
+    saved_results = {
+        key: {r["cells"]: r for r in series}
+        for key, series in saved["results"].items()
+    }
+
+    for _ in range(RECHECKS):
+        regressions, slower = _find_regressions(saved_results, threshold)
+        if not slower:
+            break
+        for (key, n_cells), new in slower.items():
+            t = best_time(measured_funcs[key, n_cells], repeat)
+            if t < new["seconds"]:
+                new["seconds"] = t
+                new["cells_per_sec"] = n_cells / t
+    regressions, slower = _find_regressions(saved_results, threshold)
+
+    print("{:<34} {:>10} {:>12} {:>12}".format("", "cells", "speed", "memory"))
+    for key, series in results.items():
+        old_series = saved_results.get(key, {})
+        for new in series:
+            old = old_series.get(new["cells"])
+            if old is not None:
+                print("{:<34} {:>10} {:>11.2f}x {:>11.2f}x".format(
+                    key, new["cells"], new["cells_per_sec"] / old["cells_per_sec"],
+                    new["peak_bytes"] / max(old["peak_bytes"], 1)
+                ))
+    return regressions
+
+def _find_regressions(saved_results, threshold):
+    """
+    Returns a list of the regressions compare_results() looks for, and a
+    dict of the measurements in the speed and scaling ones, by (key, cells).
+    """
+    regressions = []
+    slower = {}
+    for key, series in results.items():
+        old_series = saved_results.get(key, {})
+        common = [r for r in series if r["cells"] in old_series]
+        for new in common:
+            old = old_series[new["cells"]]
+            speed = new["cells_per_sec"] / old["cells_per_sec"]
+            memory = new["peak_bytes"] / max(old["peak_bytes"], 1)
+            if speed < 1 - threshold:
+                regressions.append("{} at {} cells: {:.0%} slower".format(
+                    key, new["cells"], 1 - speed
+                ))
+                slower[key, new["cells"]] = new
+            if memory > 1 + threshold and new["peak_bytes"] > MIN_COMPARED_BYTES:
+                regressions.append("{} at {} cells: {:.0%} more memory".format(
+                    key, new["cells"], memory - 1
+                ))
+
+        if len(common) > 1:
+            sizes = [r["cells"] for r in common]
+            new_exponent = scaling_exponent(sizes, [r["seconds"] for r in common])
+            old_exponent = scaling_exponent(
+                sizes, [old_series[size]["seconds"] for size in sizes]
+            )
+            if new_exponent > old_exponent + SCALING_SLACK:
+                regressions.append("{}: scaling exponent {:.2f}, was {:.2f}".format(
+                    key, new_exponent, old_exponent
+                ))
+                slower.update(((key, r["cells"]), r) for r in common)
+    return regressions, slower
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("benchmarks", nargs="*",
+            help="Benchmarks to run. Runs all of them by default. Choices: "
+            "{}".format(", ".join(benchmarks.keys())))
+    parser.add_argument("--max-cells", "-m", type=int, default=10**6,
+            help="Largest maze size, in cells, for scaling benchmarks.")
+    parser.add_argument("--seed", type=int, default=0,
+            help="Random seed.")
+    parser.add_argument("--repeat", "-r", type=int, default=3,
+            help="Runs of each sweep measurement to take the fastest of.")
+    parser.add_argument("--save", metavar="PATH",
+            help="Save the sweep's measurements to a JSON file. Runs just the "
+            "sweep unless other benchmarks are given.")
+    parser.add_argument("--compare", metavar="PATH",
+            help="Compare the sweep's measurements against a file written by "
+            "--save, and fail on regressions. Runs just the sweep unless other "
+            "benchmarks are given.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+            help="Fraction slower, or more memory, that counts as a "
+            "regression with --compare. Default: %(default)s")
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in benchmarks:
+            parser.error("unknown benchmark: {}".format(name))
+    names = args.benchmarks or benchmarks.keys()
+    if not args.benchmarks and (args.save or args.compare):
+        names = ["sweep"]
+
+    failed = []
+    for name in names:
+        random.seed(args.seed)
+        print("== {} ==".format(name))
+        if benchmarks[name](args) is False:
+            failed.append(name)
+        print()
+
+    if args.save:
+        save_results(args.save, args)
+    if args.compare:
+        print("== compare with {} ==".format(args.compare))
+        regressions = compare_results(args.compare, args.threshold, args.repeat)
+        for regression in regressions:
+            print("REGRESSION: {}".format(regression))
+        if regressions:
+            failed.append("compare")
+        print()
+
+    if failed:
+        sys.exit("Failed: {}".format(", ".join(failed)))
+
+
+if __name__ == "__main__":
+    main()
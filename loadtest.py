@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+"""
+Load tests a maze server started with serve.py, reporting latency
+percentiles and requests per second.
+
+Each of `--concurrency` connections sends requests for `path` one after
+another, until `--requests` have been sent in all.
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+import numpy
+
+
+async def load_test(host, port, path, concurrency, requests):
+    """
+    Returns the latencies in seconds of the successful requests, the number
+    that failed and the seconds taken.
+    """
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def client():
+        nonlocal remaining, errors
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                status, body = await request(reader, writer, host, path)
+                if status == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return latencies, errors, time.perf_counter() - start
+
+async def request(reader, writer, host, path):
+    """
+    Sends a GET for `path` on a keep-alive connection and returns the
+    response's `(status, body)`.
+    """
+    writer.write("GET {} HTTP/1.1\r\nHost: {}\r\n\r\n".format(path, host).encode("latin-1"))
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip().lower()
+
+    if headers.get("transfer-encoding") == "chunked":
+        chunks = []
+        while True:
+            size = int(await reader.readline(), 16)
+            chunks.append(await reader.readexactly(size + 2))
+            if size == 0:
+                break
+        body = b"".join(chunk[:-2] for chunk in chunks)
+    else:
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, body
+
+async def server_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        status, body = await request(reader, writer, host, "/stats")
+        return json.loads(body)
+    finally:
+        writer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", nargs="?",
+            default="/generate?type=rect&algorithm=backtrack&width=30&height=30",
+            help="Path and query to request.")
+    parser.add_argument("--host", default="127.0.0.1",
+            help="Address of the server.")
+    parser.add_argument("--port", "-p", default=8000, type=int,
+            help="Port of the server.")
+    parser.add_argument("--concurrency", "-c", default=16, type=int,
+            help="Number of connections sending requests at once.")
+    parser.add_argument("--requests", "-n", default=1000, type=int,
+            help="Number of requests to send in all.")
+    args = parser.parse_args()
+
+    before = asyncio.run(server_stats(args.host, args.port))
+    latencies, errors, seconds = asyncio.run(load_test(
+        args.host, args.port, args.path, args.concurrency, args.requests
+    ))
+    after = asyncio.run(server_stats(args.host, args.port))
+    batches = after["batches"] - before["batches"]
+    batched = after["batched"] - before["batched"]
+
+    print("{:<16} {:>14}".format("requests", len(latencies) + errors))
+    print("{:<16} {:>14}".format("errors", errors))
+    print("{:<16} {:>13.3f}s".format("time", seconds))
+    print("{:<16} {:>14.1f}".format("requests/sec", (len(latencies) + errors) / seconds))
+    if latencies:
+        p50, p99 = numpy.percentile(latencies, [50, 99]) * 1000
+        print("{:<16} {:>12.2f}ms".format("latency p50", p50))
+        print("{:<16} {:>12.2f}ms".format("latency p99", p99))
+        print("{:<16} {:>12.2f}ms".format("latency max", max(latencies) * 1000))
+    if batches:
+        print("{:<16} {:>14.1f}".format("mean batch", batched / batches))
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,9 @@ register_gen_classes([
     generate.Backtrack,
     generate.BacktrackRecursive,
     generate.Kruskal,
+    generate.Eller,
+    generate.BinaryTree,
+    generate.Sidewinder,
 ])
 
 ##### Maze Types #####
@@ -39,3 +42,18 @@ register_maze_types([
     RectMaze,
     HexMaze,
 ])
+
+from mazelib import analyze
+from mazelib import batch
+from mazelib import journal
+from mazelib import mazefile
+from mazelib import pool
+from mazelib import progress
+from mazelib import solve
+from mazelib import stats
+from mazelib import tiled
+from mazelib import world
+from mazelib.batch import generate_many
+from mazelib.pool import MazePool
+from mazelib.tiled import generate_tiled
+from mazelib.world import MazeWorld
@@ -0,0 +1,195 @@
+"""
+Checking that mazes are perfect, and measuring what they are like.
+
+Everything is computed from the cells' wall bits with array operations,
+for a whole batch of same-sized mazes at once (see analyze_many()), such as
+the output of `mazelib.generate_many()`. The metrics are:
+
+    perfect          Connected, acyclic, consistent and with exactly 2
+                     openings in the outside wall
+    consistent       Every wall is set or unset on both of its sides
+    components       Number of connected groups of cells
+    acyclic          Whether there is at most one path between any two cells
+    openings         Number of openings in the outside wall
+    dead_ends        Cells with a single opening
+    junctions        Cells with 3 or more openings
+    branching_factor Mean number of ways on from a cell that isn't a dead
+                     end: its openings, less the one that was come in by
+    corridor_mean    Mean and longest length, in cells, of the corridors:
+    corridor_max     runs of cells with exactly 2 openings
+    solution_length  Cells on the path between the 2 openings, or -1
+    solution_ratio   solution_length as a fraction of all cells, or NaN
+
+Openings count both passages to neighbors and openings in the outside
+wall. The entrance and exit are taken to be the 2 outside openings, so
+only the cells are needed.
+"""
+
+import numpy
+
+import mazelib
+from mazelib import solve
+from mazelib.generate import DisjointSet
+from mazelib.solve import POPCOUNT
+
+# Cells analyzed per chunk of a batch, which bounds memory use.
+CHUNK_CELLS = 1 << 20
+
+
+def analyze(maze):
+    """Returns a dict of the metrics of `maze` (see the module docstring)."""
+    results = analyze_many(maze.name, maze._cells[None])
+    return {key: values[0].item() for key, values in results.items()}
+
+def analyze_many(maze_type, cells):
+    """
+    Returns a dict of arrays of the metrics of every maze in `cells`, a
+    uint8 array indexed [maze, x, y] of mazes of type `maze_type`.
+    """
+    maze_cls = mazelib.maze_types[maze_type]
+    count, width, height = cells.shape
+    chunk_size = max(1, CHUNK_CELLS // (width*height))
+    chunks = [
+        _analyze_chunk(maze_cls, cells[start:start+chunk_size])
+        for start in range(0, count, chunk_size)
+    ]
+    return {key: numpy.concatenate([c[key] for c in chunks]) for key in chunks[0]}
+
+def _analyze_chunk(maze_cls, cells):
+    count, width, height = cells.shape
+    n_cells = width * height
+    flat = cells.reshape(count, n_cells)
+    table = maze_cls(width, height)._neighbors  # Same for every maze
+    safe_table = numpy.where(table >= 0, table, 0)
+    directions = numpy.array(maze_cls.DIRECTIONS, dtype=numpy.uint8)
+    opposite_column = [maze_cls.DIRECTIONS.index(maze_cls.OPPOSITE_DIR[d])
+                       for d in maze_cls.DIRECTIONS]
+    which = numpy.arange(count)
+
+    # Which walls are open, indexed [maze, cell, direction bit number]
+    is_open = (flat[:, :, None] & directions) == 0
+    interior = table >= 0
+    passages = is_open & interior
+    outside = is_open & ~interior
+    openings = numpy.count_nonzero(outside, axis=(1, 2))
+
+    # The other side of each interior wall must agree.
+    other_side = is_open[:, safe_table, opposite_column]
+    consistent = ~numpy.any((passages != other_side) & interior, axis=(1, 2))
+
+    ########## Connectivity ##########
+    # Each passage is counted once, from its lower cell.
+    lower = passages & (table > numpy.arange(n_cells)[:, None])
+    edges = numpy.count_nonzero(lower, axis=(1, 2))
+
+    # Search from the first opening, or the first cell if there are none. A
+    # consistent maze is a tree if that reaches every cell and it has one
+    # passage less than it has cells. That's most mazes, so only the rest
+    # have their passages joined up with a union-find.
+    starts, ends = _opening_cells(outside)
+    dist = _distances(maze_cls, cells, table, passages, starts)
+    tree = (consistent & (edges == n_cells-1)
+            & (numpy.count_nonzero(dist >= 0, axis=1) == n_cells))
+    components = numpy.ones(count, dtype=numpy.intp)
+    acyclic = tree.copy()
+    rest = numpy.flatnonzero(~tree)
+    if len(rest):
+        # Cells are numbered across the mazes, so they can share one
+        # union-find.
+        mazes, cells_a, columns = numpy.nonzero(lower[rest])
+        offsets = mazes * n_cells
+        merged = DisjointSet(len(rest)*n_cells).union_many(
+            offsets + cells_a, offsets + table[cells_a, columns]
+        )
+        merges = numpy.bincount(mazes[merged], minlength=len(rest))
+        components[rest] = n_cells - merges
+        acyclic[rest] = merges == edges[rest]
+
+    ########## Shape ##########
+    degree = len(directions) - POPCOUNT[flat]
+    dead_ends = numpy.count_nonzero(degree == 1, axis=1)
+    junctions = numpy.count_nonzero(degree >= 3, axis=1)
+    moving_on = degree >= 2
+    with numpy.errstate(invalid="ignore"):
+        branching_factor = (
+            numpy.where(moving_on, degree-1, 0).sum(axis=1)
+            / numpy.count_nonzero(moving_on, axis=1)
+        )
+
+    # Corridors are the groups of 2 opening cells joined by passages.
+    corridor = degree == 2
+    joined = lower & corridor[:, :, None] & corridor[:, safe_table]
+    mazes, cells_a, columns = numpy.nonzero(joined)
+    offsets = mazes * n_cells
+    sets = DisjointSet(count*n_cells)
+    sets.union_many(offsets + cells_a, offsets + table[cells_a, columns])
+    roots, lengths = numpy.unique(sets.find_many(numpy.flatnonzero(corridor)),
+                                  return_counts=True)
+    corridor_mazes = roots // n_cells
+    n_corridors = numpy.bincount(corridor_mazes, minlength=count)
+    with numpy.errstate(invalid="ignore"):
+        corridor_mean = (
+            numpy.bincount(corridor_mazes, weights=lengths, minlength=count)
+            / n_corridors
+        )
+    corridor_max = numpy.zeros(count, dtype=numpy.intp)
+    numpy.maximum.at(corridor_max, corridor_mazes, lengths)
+
+    ########## Solution ##########
+    # The path between the 2 openings, which the search started from one of
+    found = dist[which, ends]
+    solution_length = numpy.where((openings == 2) & (found >= 0), found + 1, -1)
+    solution_ratio = numpy.where(solution_length > 0, solution_length / n_cells, numpy.nan)
+
+    return {
+        "perfect": consistent & (components == 1) & acyclic & (openings == 2),
+        "consistent": consistent,
+        "components": components,
+        "acyclic": acyclic,
+        "openings": openings,
+        "dead_ends": dead_ends,
+        "junctions": junctions,
+        "branching_factor": branching_factor,
+        "corridor_mean": corridor_mean,
+        "corridor_max": corridor_max,
+        "solution_length": solution_length,
+        "solution_ratio": solution_ratio,
+    }
+
+def _opening_cells(outside):
+    """
+    The first and last cell of each maze with an opening in the outside
+    wall, which are the same if there's only one, or 0 if there are none.
+    """
+    count = len(outside)
+    mazes, cells = numpy.nonzero(outside.any(axis=2))
+    starts = numpy.zeros(count, dtype=numpy.intp)
+    ends = numpy.zeros(count, dtype=numpy.intp)
+
+    # Cells are in order, and the last value assigned to an index sticks.
+    starts[mazes[::-1]] = cells[::-1]
+    ends[mazes] = cells
+    return starts, ends
+
+def _distances(maze_cls, cells, table, passages, starts):
+    """
+    Breadth first search of each maze from its cell in `starts`. Returns the
+    number of steps to each cell, indexed [maze, cell index], with -1 for
+    unreachable cells.
+    """
+    count, width, height = cells.shape
+    n_cells = width * height
+
+    # A single maze goes through the solver, which walks a perfect maze's
+    # Euler tour rather than searching it.
+    if count == 1:
+        maze = maze_cls(width, height, cells=cells[0])
+        return solve.distances(maze, int(starts[0])).reshape(1, n_cells)
+
+    # Otherwise search all the mazes at once, with their cells numbered one
+    # after the other.
+    offsets = numpy.arange(count) * n_cells
+    neighbors = numpy.where(passages, table + offsets[:, None, None], -1)
+    neighbors = neighbors.reshape(-1, table.shape[1])
+    dist, parents = solve.search_neighbors(neighbors, offsets + starts)
+    return dist.reshape(count, n_cells)
@@ -0,0 +1,87 @@
+"""
+Generating many mazes at once, spread over worker processes.
+"""
+
+import os
+import random
+import concurrent.futures
+
+import numpy
+
+import mazelib
+from mazelib.stats import GenStats
+
+
+def maze_rng(seed, index):
+    """
+    Returns the `random.Random` that maze number `index` of a batch generated
+    with `seed` uses. Every maze gets its own independent stream, so a maze
+    only depends on the seed and its index, not on how the batch was split
+    between workers.
+    """
+    return spawn_rng(seed, index)
+
+def spawn_rng(seed, *key):
+    """
+    Returns a `random.Random` seeded from `seed` and the spawn key `key`, a
+    tuple of non-negative integers. Different keys give independent streams.
+    """
+    state = numpy.random.SeedSequence(seed, spawn_key=key).generate_state(4)
+    return random.Random(int.from_bytes(state.tobytes(), "little"))
+
+def generate_many(maze_type, generator, width, height, count, seed=None,
+                  workers=None, stats=None):
+    """
+    Generates `count` mazes and returns their cells as a uint8 array indexed
+    [maze, x, y]. Each `result[i]` can be passed as the `cells` argument of
+    the maze type to get a maze object back.
+
+    `maze_type` and `generator` are names from `mazelib.maze_types` and
+    `mazelib.generators`. The result only depends on `seed`, not on
+    `workers`, which is the number of processes to use and defaults to the
+    number of CPUs. With a `seed` of None, a random one is picked.
+
+    If `stats` is a `stats.GenStats`, the statistics of every maze are added
+    to it, as by `MazeGen.generate()`.
+    """
+    if seed is None:
+        seed = numpy.random.SeedSequence().entropy
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    cells = numpy.empty((count, width, height), dtype=numpy.uint8)
+    if workers <= 1 or count <= 1:
+        _generate_range(maze_type, generator, width, height, seed, 0, count,
+                        out=cells, stats=stats)
+        return cells
+
+    # A few chunks per worker, so they finish around the same time.
+    chunk_size = max(1, -(-count // (workers*4)))
+    starts = range(0, count, chunk_size)
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(_generate_range, maze_type, generator, width,
+                            height, seed, start, min(start+chunk_size, count),
+                            stats=None if stats is None else GenStats())
+            for start in starts
+        ]
+        for start, future in zip(starts, futures):
+            chunk, chunk_stats = future.result()
+            cells[start:start+len(chunk)] = chunk
+            if stats is not None:
+                stats.merge(chunk_stats)
+
+    return cells
+
+def _generate_range(maze_type, generator, width, height, seed, start, stop,
+                    out=None, stats=None):
+    maze_cls = mazelib.maze_types[maze_type]
+    gen_cls = mazelib.generators[generator]
+    if out is None:
+        out = numpy.empty((stop-start, width, height), dtype=numpy.uint8)
+
+    out[:] = maze_cls.ALL_WALLS
+    for i in range(start, stop):
+        m = maze_cls(width, height, cells=out[i-start])
+        gen_cls(m, rng=maze_rng(seed, i)).generate(stats)
+    return out, stats
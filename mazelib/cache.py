@@ -0,0 +1,63 @@
+"""
+Least recently used caches bounded by the size of what they hold.
+"""
+
+import threading
+import collections
+
+
+class ByteLRU():
+    """
+    Keeps values by key while their total size is at most `max_bytes`,
+    evicting the least recently used first. A value's size is `size(value)`,
+    by default its `nbytes`. Values bigger than `max_bytes` aren't kept at
+    all. It is safe to use from several threads.
+    """
+
+    def __init__(self, max_bytes, size=None):
+        self.max_bytes = max_bytes
+        self.size = size or (lambda value: value.nbytes)
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()  # Oldest first
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        """Returns the value for `key`, or None if it isn't kept."""
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Keeps `value` for `key`, and returns the value kept for it: an
+        earlier one if there is one, since another thread may have added the
+        same value meanwhile.
+        """
+        size = self.size(value)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            if size > self.max_bytes:
+                return value  # Would evict everything and still not fit
+            while self.nbytes + size > self.max_bytes:
+                old_key, old_value = self.entries.popitem(last=False)
+                self.nbytes -= self.size(old_value)
+                self.evictions += 1
+            self.entries[key] = value
+            self.nbytes += size
+            return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self.entries)
@@ -1,15 +1,38 @@
 
+import sys
+import time
 import random
 import collections
 
+import numpy
+
 from mazelib import Maze
+from mazelib.maze import RectMaze
+from mazelib.journal import Journal
+
+# Steps generate() runs per step_many() call, unless a generator sets its
+# own `generate_batch`.
+GENERATE_BATCH = 1024
+
+# Batches of at least this many steps are run with array operations by
+# generators that can.
+BULK_STEPS = 64
 
 
 class MazeGen():
     name = None
-
-    def __init__(self, maze):
+    supported_maze_types = None  # Names of maze types, or None for all
+    generate_batch = GENERATE_BATCH  # Steps per step_many() in generate()
+
+    def __init__(self, maze, rng=None):
+        """
+        `rng` is the `random.Random` to make random choices with. By default
+        the `random` module's global state is used.
+        """
+        assert self.supported_maze_types is None or \
+                maze.name in self.supported_maze_types
         self.m = maze
+        self.rng = random if rng is None else rng
 
     def init(self):
         pass
@@ -23,18 +46,121 @@ class MazeGen():
     def finish(self):
         return self.m
 
-    def generate(self):
+    def frontier_size(self):
+        """
+        Size of the stack or frontier of cells or walls still to visit, or
+        None for generators without one. Only used for statistics.
+        """
+        return None
+
+    def remove_random_side_wall(self, side_id):
+        """
+        Removes a random wall on side `side_id` of the maze and returns it as
+        `(cell index, direction)`.
+        """
+        wall = self.rng.choice(list(self.m.side_get(side_id).walls))
+        wall.remove()
+        return (self.m.cell_index(wall.c1_id), wall.d1)
+
+    def step_many(self, n):
+        """
+        Runs up to `n` steps, stopping early if generation finishes, and
+        returns how many were run. Subclasses can override this with an inner
+        loop that doesn't pay for a method call per step.
+        """
+        for i in range(n):
+            if self.is_finished():
+                return i
+            self.step()
+        return n
+
+    def generate(self, stats=None):
+        """
+        Generates the whole maze and returns it. If `stats` is a
+        `stats.GenStats`, the time spent in each phase and other counts are
+        added to it.
+        """
+        if stats is not None:
+            for m in self._iter_steps_stats(self.generate_batch, stats):
+                pass
+            return m
+
         self.init()
         while not self.is_finished():
-            self.step()
+            self.step_many(self.generate_batch)
         return self.finish()
 
-    def iter_steps(self):
+    def iter_steps(self, batch=1, stats=None):
+        """
+        Yields the maze after every `batch` steps, and once more after
+        finish(). `stats` is as for generate().
+        """
+        if stats is not None:
+            yield from self._iter_steps_stats(batch, stats)
+            return
+
         self.init()
         while not self.is_finished():
-            yield self.step()
+            if batch == 1:
+                yield self.step()
+            else:
+                self.step_many(batch)
+                yield self.m
         yield self.finish()
 
+    def _iter_steps_stats(self, batch, stats):
+        """iter_steps(), adding the time each phase takes to `stats`."""
+        clock = time.perf_counter
+        stats.start_maze(self.m)
+        start = clock()
+        self.init()
+        stats.add_phase("init", clock() - start)
+        stats.add_frontier(self.frontier_size())
+
+        while not self.is_finished():
+            start = clock()
+            if batch == 1:
+                result, steps = self.step(), 1
+            else:
+                result, steps = self.m, self.step_many(batch)
+            stats.add_phase("steps", clock() - start)
+            stats.add_steps(steps)
+            stats.add_frontier(self.frontier_size())
+            yield result
+
+        start = clock()
+        m = self.finish()
+        stats.add_phase("finish", clock() - start)
+        stats.end_maze(m)
+        yield m
+
+    def iter_changes(self, batch=1, stats=None):
+        """
+        Like iter_steps(), but yields a list of the indexes of the cells each
+        batch of steps changed, for redrawing just those. The first list
+        includes the changes made by init() and the last those made by
+        finish().
+        """
+        self.m.track_changes()
+        try:
+            for m in self.iter_steps(batch, stats):
+                yield self.m.pop_changes()
+        finally:
+            self.m.track_changes(False)
+
+    def record(self, batch=1):
+        """
+        Generates the maze like generate(), and returns a journal.Journal of
+        every wall change, with one journal step per `batch` steps.
+        """
+        journal = Journal.start(self.m)
+        try:
+            for m in self.iter_steps(batch):
+                journal.end_step()
+        finally:
+            journal.stop()
+        return journal
+
     def in_bounds(self, x, y):
         return x>=0 and y>=0 and x<self.width and y<self.height
 
@@ -46,89 +172,177 @@ class Backtrack(MazeGen):
     name = "backtrack"
 
     def init(self):
+        m = self.m
 
         # Entrance fixed here to be random
-        enter_wall = random.choice(list(
-            self.m.side_get(self.m.default_enter_side).walls
-        ))
-        enter_wall.remove()
-        enter_cell = enter_wall.c1
+        m.entrance = self.remove_random_side_wall(m.default_enter_side)
+        enter_cell = m.entrance[0]
 
         # Exit chosen random for now, but will be changed later to be the
         # furthest possible from the entrance. Only at the end will we remove
         # this wall, since these will change during generation.
-        self.exit_cell = random.choice(list(
-            self.m.side_get(self.m.default_exit_side).cells
-        ))
+        self.exit_cell = m.cell_index(self.rng.choice(list(
+            m.side_get(m.default_exit_side).cells
+        )).cell_id)
         self.exit_dist = 0  # Distance between entrance and exit
 
         self.stack = [enter_cell]
-        self.visited = set(enter_cell.cell_id)
+        self.visited = bytearray(m.cell_count())
+        self.visited[enter_cell] = True
 
     def step(self):
-        cell = self.stack[-1]
-
-        # Move exit cell if this is further away from the entrance than the
-        # current one.
-        if cell.is_on_side(self.m.default_exit_side) and len(self.stack) > self.exit_dist:
-            self.exit_dist = len(self.stack)
-            self.exit_cell = cell
-
-        walls = list(cell.interior_walls)
-        random.shuffle(walls)
-        neighbor_found = False
-        for wall in walls:
-            other_cell = wall.c2
-            if other_cell.cell_id not in self.visited:
-                wall.remove()
-                self.stack.append(other_cell)
-                self.visited.add(other_cell.cell_id)
-                neighbor_found = True
-                break
-        if not neighbor_found:
-            self.stack.pop()
-
+        self.step_many(1)
         return self.m
 
+    def step_many(self, n):
+        m = self.m
+        stack, visited = self.stack, self.visited
+        exit_walls = m._side_walls[m.default_exit_side]
+        neighbors, directions = m._neighbors, m.DIRECTIONS
+        choice, remove_wall = self.rng.choice, m.remove_wall
+
+        steps = 0
+        while steps < n and stack:
+            steps += 1
+            cell = stack[-1]
+
+            # Move exit cell if this is further away from the entrance than
+            # the current one.
+            if len(stack) > self.exit_dist and exit_walls[cell]:
+                self.exit_dist = len(stack)
+                self.exit_cell = cell
+
+            unvisited = [(d, other)
+                         for d, other in zip(directions, neighbors[cell].tolist())
+                         if other >= 0 and not visited[other]]
+            if unvisited:
+                d, other = choice(unvisited)
+                remove_wall(cell, d)
+                stack.append(other)
+                visited[other] = True
+            else:
+                stack.pop()
+
+        return steps
+
     def finish(self):
-        self.exit_cell.get_side_wall(self.m.default_exit_side).remove()
+        exit_wall = self.m.side_wall(self.exit_cell, self.m.default_exit_side)
+        self.m.remove_wall(self.exit_cell, exit_wall)
+        self.m.exit = (self.exit_cell, exit_wall)
         return self.m
 
     def is_finished(self):
         return len(self.stack) == 0
 
+    def frontier_size(self):
+        return len(self.stack)
+
 
 class BacktrackRecursive(MazeGen):
     """
         http://weblog.jamisbuck.org/2010/12/27/maze-generation-recursive-backtracking
+
+        By default the recursion runs on an explicit stack, so maze size isn't
+        limited by Python's recursion limit. It carves exactly what the
+        recursive version (`iterative=False`) does for the same random state.
     """
     name = "backtrack_recursive"
 
-    def generate(self):
+    def __init__(self, maze, rng=None, iterative=True):
+        super().__init__(maze, rng)
+        self.iterative = iterative
 
-        enter_wall = random.choice(list(
-            self.m.side_get(self.m.default_enter_side).walls
-        ))
-        enter_wall.remove()
+    def init(self):
+        m = self.m
+        m.entrance = self.remove_random_side_wall(m.default_enter_side)
+        m.exit = self.remove_random_side_wall(m.default_exit_side)
+
+        self.visited = bytearray(m.cell_count())
+        enter_cell = m.entrance[0]
+        if not self.iterative:
+            self.enter_cell = enter_cell
+            return
+
+        # Each stack entry is a cell, its neighbor directions in the order
+        # they will be tried (padded with 0), and the position of the next
+        # direction to try. A cell is only ever on the stack once, so the
+        # stack can't be bigger than the number of cells.
+        n_cells = m.cell_count()
+        self.stack_cells = numpy.empty(n_cells, dtype=numpy.intp)
+        self.stack_dirs = numpy.empty((n_cells, len(m.DIRECTIONS)), dtype=numpy.uint8)
+        self.stack_next = numpy.empty(n_cells, dtype=numpy.uint8)
+        self.stack_size = 0
+        self.push(enter_cell)
+
+    def push(self, cell):
+        self.visited[cell] = True
+        neighbors = self.m.neighbors(cell)
+        self.rng.shuffle(neighbors)
+
+        top = self.stack_size
+        self.stack_cells[top] = cell
+        self.stack_dirs[top] = 0
+        self.stack_dirs[top, :len(neighbors)] = [d for d, other in neighbors]
+        self.stack_next[top] = 0
+        self.stack_size += 1
 
-        exit_wall = random.choice(list(
-            self.m.side_get(self.m.default_exit_side).walls
-        ))
-        exit_wall.remove()
+    def step(self):
+        m = self.m
+        top = self.stack_size - 1
+        cell = int(self.stack_cells[top])
+        dirs = self.stack_dirs[top].tolist()
+
+        for i in range(self.stack_next[top], len(dirs)):
+            d = dirs[i]
+            if d == 0:
+                break
+            other = m.neighbor(cell, d)
+            if not self.visited[other]:
+                self.stack_next[top] = i + 1
+                m.remove_wall(cell, d)
+                self.push(other)
+                return m
 
-        visited = set()
-        def recurse(cell):
-            visited.add(cell.cell_id)
-            walls = list(cell.interior_walls)
-            random.shuffle(walls)
-            for wall in walls:
-                other_cell = wall.c2
-                if other_cell.cell_id not in visited:
-                    wall.remove()
-                    recurse(other_cell)
+        self.stack_size -= 1
+        return m
 
-        recurse(enter_wall.c1)
+    def is_finished(self):
+        return self.stack_size == 0
+
+    def frontier_size(self):
+        return self.stack_size if self.iterative else None
+
+    def generate(self, stats=None):
+        if self.iterative:
+            return super().generate(stats)
+
+        m = self.m
+        clock = time.perf_counter
+        if stats is not None:
+            stats.start_maze(m)
+            start = clock()
+        self.init()
+        if stats is not None:
+            stats.add_phase("init", clock() - start)
+            start = clock()
 
+        visited = self.visited
+        def recurse(cell):
+            visited[cell] = True
+            neighbors = m.neighbors(cell)
+            self.rng.shuffle(neighbors)
+            for d, other in neighbors:
+                if not visited[other]:
+                    m.remove_wall(cell, d)
+                    recurse(other)
+
+        recurse(self.enter_cell)
+
+        # The recursion can't be split into steps, so it counts as one.
+        if stats is not None:
+            stats.add_phase("steps", clock() - start)
+            stats.add_steps(1)
+            stats.end_maze(m)
         return self.m
 
 
@@ -137,40 +351,405 @@ class Kruskal(MazeGen):
         http://weblog.jamisbuck.org/2011/1/3/maze-generation-kruskal-s-algorithm
     """
     name = "kruskal"
+    generate_batch = sys.maxsize  # All of them in one step_many()
+
+    def init(self):
+        m = self.m
+        n_cells = m.cell_count()
+
+        # Every interior wall once, as the cell on one side, its direction and
+        # the cell on the other side, in random order.
+        neighbors = m._neighbors
+        cells, columns = numpy.nonzero(neighbors > numpy.arange(n_cells)[:, None])
+        np_rng = numpy.random.default_rng(self.rng.getrandbits(64))
+        order = np_rng.permutation(len(cells))
+        self.cells = cells[order]
+        self.directions = numpy.array(m.DIRECTIONS, dtype=numpy.uint8)[columns[order]]
+        self.others = neighbors[self.cells, columns[order]]
+        self.next = 0  # Next candidate wall
+        self.sets = DisjointSet(n_cells)
+
+        m.entrance = self.remove_random_side_wall(m.default_enter_side)
+        m.exit = self.remove_random_side_wall(m.default_exit_side)
+
+    def step(self):
+        self.step_many(1)
+        return self.m
+
+    def step_many(self, n):
+        start = self.next
+        stop = self.next = min(start + n, len(self.cells))
+        cells = self.cells[start:stop]
+        directions = self.directions[start:stop]
+        others = self.others[start:stop]
+
+        if stop - start < BULK_STEPS:
+            union, remove_wall = self.sets.union, self.m.remove_wall
+            for cell, d, other in zip(cells.tolist(), directions.tolist(),
+                                      others.tolist()):
+                if union(cell, other):
+                    remove_wall(cell, d)
+            return stop - start
+
+        # Which walls get removed doesn't depend on the order they are
+        # removed in, so work them out together and remove them all at once.
+        merged = self.sets.union_many(cells, others)
+        # A cell can lose walls in several directions, but only one in each,
+        # so go a direction at a time.
+        m = self.m
+        cells, directions, others = cells[merged], directions[merged], others[merged]
+        for d in m.DIRECTIONS:
+            with_d = directions == d
+            for side, wall in ((cells[with_d], d), (others[with_d], m.OPPOSITE_DIR[d])):
+                m.set_cells(side, m._flat[side] & (~wall & m.ALL_WALLS))
+        return stop - start
+
+    def is_finished(self):
+        return self.next == len(self.cells)
+
+    def frontier_size(self):
+        return len(self.cells) - self.next  # Candidate walls left
+
+
+class Eller(MazeGen):
+    """
+        http://weblog.jamisbuck.org/2010/12/29/maze-generation-eller-s-algorithm
+
+        Only one row of state is kept, so iter_rows() can produce mazes of
+        any height, or with no end at all, in memory proportional to the
+        width.
+    """
+    name = "eller"
+    supported_maze_types = ("rect",)
 
     def init(self):
-        self.candidate_walls = filter(lambda w: w.interior, self.m.walls_get_all())
-        self.candidate_walls = list(self.candidate_walls)
-        random.shuffle(self.candidate_walls)
-        self.labels = {}  # Maps cell ids to labels
-
-        # Remove random entrance wall
-        enter_wall = random.choice(list(
-            self.m.side_get(self.m.default_enter_side).walls
-        ))
-        enter_wall.remove()
-
-        # Remove random exit wall
-        exit_wall = random.choice(list(
-            self.m.side_get(self.m.default_exit_side).walls
-        ))
-        exit_wall.remove()
+        self.rows = self.iter_rows(self.m.width, self.m.height, self.rng)
+        self.y = 0
 
     def step(self):
-        w = self.candidate_walls.pop()
-        label1 = self.labels.get(w.c1.cell_id, w.c1.cell_id)
-        label2 = self.labels.get(w.c2.cell_id, w.c2.cell_id)
-        if label1 != label2:
-            w.remove()
-
-            # Set c1's label to c2's
-            self.labels[w.c1.cell_id] = label2
-            self.labels[w.c2.cell_id] = label2
-            for cell_id, label in self.labels.items():
-                if label == label1:
-                    self.labels[cell_id] = label2
+        self.m.set_rows(self.y, next(self.rows)[:, None])
+        self.y += 1
+        return self.m
 
+    def is_finished(self):
+        return self.y == self.m.height
+
+    def finish(self):
+        m = self.m
+        enter_x = numpy.flatnonzero((m._cells[:, 0] & m.N) == 0)[0]
+        exit_x = numpy.flatnonzero((m._cells[:, -1] & m.S) == 0)[0]
+        m.entrance = (m.cell_index((enter_x, 0)), m.N)
+        m.exit = (m.cell_index((exit_x, m.height-1)), m.S)
+        return m
+
+    @staticmethod
+    def iter_rows(width, height=None, rng=None):
+        """
+        Generates a RectMaze row by row, yielding each row as soon as it is
+        finished as a uint8 array of the wall bits of its cells, like
+        `RectMaze._cells[:, y]`. With a `height` of None rows are generated
+        forever, and the maze has no exit.
+        """
+        rng = random if rng is None else rng
+        np_rng = numpy.random.default_rng(rng.getrandbits(64))
+        N, S, E, W = RectMaze.N, RectMaze.S, RectMaze.E, RectMaze.W
+        all_walls = RectMaze.ALL_WALLS
+
+        # Set of each cell in the current row, labeled 0 to width-1, and
+        # whether it was connected to the cell above.
+        sets = numpy.arange(width)
+        open_north = numpy.zeros(width, dtype=bool)
+        open_north[rng.randrange(width)] = True  # Entrance
+
+        y = 0
+        while height is None or y < height:
+            last = y == height-1 if height is not None else False
+            row = numpy.full(width, all_walls, dtype=numpy.uint8)
+            row[open_north] &= ~N & all_walls
+
+            # Randomly join neighbors in different sets. The last row joins
+            # every set, so the maze ends up connected.
+            if last:
+                candidates = numpy.arange(width-1)
+            else:
+                candidates = numpy.flatnonzero(np_rng.random(width-1) < 0.5)
+            row_sets = DisjointSet(width)
+            joined = numpy.zeros(width-1, dtype=bool)
+            joined[candidates] = row_sets.union_many(sets[candidates], sets[candidates+1])
+            row[:-1][joined] &= ~E & all_walls
+            row[1:][joined] &= ~W & all_walls
+            sets = row_sets.roots()[sets]
+
+            if last:
+                row[rng.randrange(width)] &= ~S & all_walls  # Exit
+                yield row
+                return
+
+            # Carve down from at least one cell of each set: the one with
+            # the highest random key, plus any others with low keys.
+            keys = np_rng.random(width)
+            highest = numpy.zeros(width)
+            numpy.maximum.at(highest, sets, keys)
+            down = (keys == highest[sets]) | (keys < 0.3)
+            row[down] &= ~S & all_walls
+            yield row
+
+            # Cells below keep their set. Others start a new set, using the
+            # labels no set in the row uses anymore.
+            unused = numpy.setdiff1d(numpy.arange(width), sets[down])
+            sets[~down] = unused[:numpy.count_nonzero(~down)]
+            open_north = down
+            y += 1
+
+
+class RowGen(MazeGen):
+    """
+        Base for generators that carve a block of rows at a time with array
+        operations, where each cell only opens walls to its north and east.
+        Each step is a row, and step_many() carves its rows in one go.
+
+        Subclasses implement carve(start, stop), returning bool arrays
+        indexed [x, y-start] of whether each cell in rows `start` to `stop`
+        opens its north and its east wall. The random numbers for each row
+        must be drawn in order, so the maze doesn't depend on how rows are
+        batched.
+    """
+    supported_maze_types = ("rect",)
+    generate_batch = sys.maxsize  # All the rows in one step_many()
+
+    def init(self):
+        self.np_rng = numpy.random.default_rng(self.rng.getrandbits(64))
+        self.y = 0
+
+    def step(self):
+        self.step_many(1)
         return self.m
 
+    def step_many(self, n):
+        m = self.m
+        N, S, E, W = m.N, m.S, m.E, m.W
+        start, stop = self.y, min(self.y + n, m.height)
+        north, east = self.carve(start, stop)
+        north, east = north.view(numpy.uint8), east.view(numpy.uint8)
+
+        # Rows from the one above `start`, which loses the south walls of
+        # cells carved north.
+        first = max(start-1, 0)
+        rows = m._cells[:, first:stop].copy()
+        block = rows[:, start-first:]
+        block[:] = m.ALL_WALLS & ~(north*N | east*E)
+        block[1:] &= ~(east[:-1]*W)
+        lower = max(start, 1)
+        rows[:, lower-1-first:stop-1-first] &= ~(north[:, lower-start:]*S)
+
+        m.set_rows(first, rows)
+        self.y = stop
+        return stop - start
+
     def is_finished(self):
-        return len(self.candidate_walls) == 0
+        return self.y == self.m.height
+
+    def finish(self):
+        # Open the entrance and exit in the cells directly, like Eller, since
+        # remove_random_side_wall() would build the per-size tables for them.
+        m = self.m
+        openings = []
+        for y, side in ((0, m.N), (m.height-1, m.S)):
+            cell = m.cell_index((self.rng.randrange(m.width), y))
+            cells = numpy.array([cell])
+            m.set_cells(cells, m._flat[cells] & (~side & m.ALL_WALLS))
+            openings.append((cell, side))
+        m.entrance, m.exit = openings
+        return m
+
+
+class BinaryTree(RowGen):
+    """
+        http://weblog.jamisbuck.org/2011/2/1/maze-generation-binary-tree-algorithm
+
+        Every cell opens north or east at random, except along the north
+        and east sides, which become long corridors.
+    """
+    name = "binary_tree"
+
+    def carve(self, start, stop):
+        w = self.m.width
+        north = (self.np_rng.random((stop-start, w)) < 0.5).T
+        north[w-1] = True
+        if start == 0:
+            north[:, 0] = False
+        east = ~north
+        east[w-1] = False
+        return north, east
+
+
+class Sidewinder(RowGen):
+    """
+        http://weblog.jamisbuck.org/2011/2/3/maze-generation-sidewinder-algorithm
+
+        Each row is split at random into runs of cells joined east to west,
+        and each run opens north from one random cell. The first row is a
+        single run.
+    """
+    name = "sidewinder"
+
+    def carve(self, start, stop):
+        w = self.m.width
+        draws = self.np_rng.random((stop-start, 2, w))
+        closed = draws[:, 0] < 0.5  # Whether a run ends at each cell
+        closed[:, w-1] = True
+        if start == 0:
+            closed[0, :w-1] = False
+
+        # Runs end with the row, so runs are also contiguous across rows in
+        # this row by row order.
+        closed = closed.reshape(-1)
+        starts = numpy.flatnonzero(numpy.concatenate(([True], closed[:-1])))
+        lengths = numpy.diff(numpy.append(starts, closed.size))
+
+        # The first cell of each run draws which cell of the run opens north.
+        keys = draws[:, 1].reshape(-1)[starts]
+        north = numpy.zeros(closed.size, dtype=bool)
+        north[starts + (keys*lengths).astype(numpy.intp)] = True
+        north = north.reshape(stop-start, w)
+        if start == 0:
+            north[0] = False
+        return north.T, ~closed.reshape(stop-start, w).T
+
+
+#################### Helper Classes ####################
+
+class DisjointSet():
+    """
+        Union-find over the integers 0 to size-1, with path compression and
+        union by rank.
+
+        https://en.wikipedia.org/wiki/Disjoint-set_data_structure
+    """
+
+    def __init__(self, size):
+        self.parent = numpy.arange(size, dtype=numpy.intp)
+        self.rank = numpy.zeros(size, dtype=numpy.uint8)
+
+    def find(self, i):
+        parent = self.parent
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+
+        # Path compression: point everything we passed through at the root.
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+
+        return root
+
+    def union(self, a, b):
+        """
+        Merges the sets containing `a` and `b`. Returns False if they were
+        already in the same set.
+        """
+        root_a = self.find(a)
+        root_b = self.find(b)
+        if root_a == root_b:
+            return False
+
+        rank = self.rank
+        if rank[root_a] < rank[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        if rank[root_a] == rank[root_b]:
+            rank[root_a] += 1
+        return True
+
+    def union_many(self, a, b):
+        """
+        Same as calling union() on each pair `(a[k], b[k])` in order, but
+        with array operations. Returns a bool array of union()'s results.
+        """
+        a = numpy.asarray(a, dtype=numpy.intp)
+        b = numpy.asarray(b, dtype=numpy.intp)
+        n_pairs = len(a)
+        merged = numpy.zeros(n_pairs, dtype=bool)
+        if n_pairs == 0:
+            return merged
+
+        # Work on the sets the pairs touch, labeled 0 to n_sets-1, and which
+        # group of merged sets each one is in. With many pairs, labeling
+        # costs more than working on every element.
+        root_a, root_b = self.find_many(a), self.find_many(b)
+        if 2*n_pairs < len(self.parent):
+            roots, labels = numpy.unique(
+                numpy.concatenate((root_a, root_b)), return_inverse=True
+            )
+            label_a, label_b = labels[:n_pairs], labels[n_pairs:]
+        else:
+            roots = numpy.arange(len(self.parent))
+            label_a, label_b = root_a, root_b
+        n_sets = len(roots)
+        group = numpy.arange(n_sets)
+
+        # The pairs union() would merge are the minimum spanning forest of
+        # the sets, weighting each pair by its position. Find it with
+        # Boruvka's algorithm: every group merges along the first pair that
+        # joins it to another group, which at least halves the number of
+        # groups each round.
+        pairs = numpy.arange(n_pairs)
+        while True:
+            group_a, group_b = group[label_a[pairs]], group[label_b[pairs]]
+            joining = group_a != group_b
+            pairs = pairs[joining]
+            if len(pairs) == 0:
+                break
+            group_a, group_b = group_a[joining], group_b[joining]
+
+            first = numpy.full(n_sets, n_pairs, dtype=numpy.intp)
+            numpy.minimum.at(first, group_a, pairs)
+            numpy.minimum.at(first, group_b, pairs)
+            groups = numpy.flatnonzero(first < n_pairs)
+            chosen = first[groups]
+            merged[chosen] = True
+
+            # Point each group at the group across its pair. Two groups that
+            # chose the same pair point at each other, so make the lower one
+            # the root. Then follow the pointers to the root.
+            chosen_a, chosen_b = group[label_a[chosen]], group[label_b[chosen]]
+            target = numpy.where(chosen_a == groups, chosen_b, chosen_a)
+            parent = numpy.arange(n_sets)
+            parent[groups] = target
+            mutual = (parent[target] == groups) & (groups < target)
+            parent[groups[mutual]] = groups[mutual]
+            while True:
+                grandparent = parent[parent]
+                if numpy.array_equal(grandparent, parent):
+                    break
+                parent = grandparent
+            group = parent[group]
+
+        moved = group != numpy.arange(n_sets)
+        self.parent[roots[moved]] = roots[group[moved]]
+        return merged
+
+    def find_many(self, items):
+        """
+        Returns an array of the root of each element of `items`.
+        """
+        parent = self.parent
+        roots = parent[items]
+        while True:
+            up = parent[roots]
+            if numpy.array_equal(up, roots):
+                return roots
+            roots = up
+
+    def roots(self):
+        """
+        Returns an array of the root of every element.
+        """
+        # Pointer jumping: replace each parent with its grandparent until
+        # every element points straight at its root.
+        parent = self.parent
+        while True:
+            grandparent = parent[parent]
+            if numpy.array_equal(grandparent, parent):
+                return parent.copy()
+            parent[:] = grandparent
@@ -0,0 +1,105 @@
+"""
+Writing PNG images with only the standard library.
+
+Images are 1 bit per pixel, black and white, and are written and compressed
+a band of rows at a time, so an image never has to be in memory all at once
+(see `Maze.to_img()`).
+"""
+
+import os
+import zlib
+import struct
+
+import numpy
+
+SIGNATURE = b"\x89PNG\r\n\x1a\n"
+IHDR = struct.Struct(">IIBBBBB")
+
+# Compressed data is written in chunks of about this many bytes.
+IDAT_SIZE = 1 << 16
+
+
+class PngWriter():
+    """
+    Writes a `width` by `height` black and white PNG image to `f`, a path or
+    binary file object, given its rows with write_rows(). close() finishes
+    the image once all the rows are written.
+
+        >>> with PngWriter("maze.png", width, height) as png:
+        ...     for rows in bands:
+        ...         png.write_rows(rows)
+    """
+
+    def __init__(self, f, width, height, level=6):
+        if isinstance(f, (str, os.PathLike)):
+            self.f = open(f, "wb")
+            self.owns_file = True
+        else:
+            self.f = f
+            self.owns_file = False
+        self.width = width
+        self.height = height
+        self.rows_left = height
+        self.compressor = zlib.compressobj(level)
+        self.pending = []  # Compressed data not written yet
+        self.pending_size = 0
+
+        # Bit depth 1, grayscale, no interlacing
+        self.f.write(SIGNATURE)
+        self._write_chunk(b"IHDR", IHDR.pack(width, height, 1, 0, 0, 0, 0))
+
+    def write_rows(self, pixels):
+        """
+        Writes the next rows of the image, given as a bool array indexed
+        [y, x] that is True for black pixels.
+        """
+        n_rows, width = pixels.shape
+        assert width == self.width and n_rows <= self.rows_left
+        self.rows_left -= n_rows
+
+        # Each row is a filter type byte (0, none) followed by the row's
+        # pixels, 8 to a byte with the first in the highest bit. Grayscale 0
+        # is black.
+        packed = numpy.packbits(~pixels, axis=1)
+        rows = numpy.zeros((n_rows, 1 + packed.shape[1]), dtype=numpy.uint8)
+        rows[:, 1:] = packed
+        self._add_data(self.compressor.compress(rows.tobytes()))
+
+    def close(self):
+        if self.compressor is None:
+            return
+        assert self.rows_left == 0, "{} rows not written".format(self.rows_left)
+        self._add_data(self.compressor.flush())
+        self.compressor = None
+        self._flush_data()
+        self._write_chunk(b"IEND", b"")
+        if self.owns_file:
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is None:
+            self.close()
+        elif self.owns_file:
+            self.f.close()
+
+    def _add_data(self, data):
+        if data:
+            self.pending.append(data)
+            self.pending_size += len(data)
+        if self.pending_size >= IDAT_SIZE:
+            self._flush_data()
+
+    def _flush_data(self):
+        if self.pending:
+            self._write_chunk(b"IDAT", b"".join(self.pending))
+            self.pending = []
+            self.pending_size = 0
+
+    def _write_chunk(self, chunk_type, data):
+        self.f.write(struct.pack(">I", len(data)))
+        self.f.write(chunk_type)
+        self.f.write(data)
+        self.f.write(struct.pack(">I", zlib.crc32(chunk_type + data)))
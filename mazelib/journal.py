@@ -0,0 +1,251 @@
+"""
+Journals of the wall changes made while generating a maze.
+
+A journal starts from a snapshot of the maze and records every change to
+its wall bits as a `(cell index, direction, value)` entry, grouped into
+steps. That is far smaller than a snapshot per step, and the maze after any
+step can be rebuilt by applying the entries up to it with array operations,
+so a generation can be replayed and scrubbed through without running the
+generator again:
+
+    >>> journal = mazelib.generators["kruskal"](maze).record()
+    >>> journal.save("kruskal.mazj")
+    >>> replay = Replay(Journal.load("kruskal.mazj"))
+    >>> replay.seek(1000).to_str()
+
+An entry sets a single bit of a single cell, so a wall between two cells
+is recorded as one entry for each of them.
+
+File format, little endian:
+
+    magic        4s   b"MAZJ"
+    version      H
+    maze type    8s   Name from `mazelib.maze_types`, NUL padded
+    width        I
+    height       I
+    steps        Q    Number of steps
+    entries      Q    Number of entries
+    entrance     qB   Cell index and direction, -1 and 0 if unknown
+    exit         qB   Cell index and direction, -1 and 0 if unknown
+
+followed by the snapshot's cells, packed like `mazefile.pack_cells()`, the
+index of the first entry of each step and the end of the last one (<u8),
+then the entries' cell indexes (<u4), directions (u1) and values (u1).
+"""
+
+import array
+import mmap
+import struct
+
+import numpy
+
+import mazelib
+from mazelib import mazefile
+
+VERSION = 1
+
+HEADER = struct.Struct("<4sH8sIIQQqBqB")
+MAGIC = b"MAZJ"
+
+# Entries applied per array operation when replaying, which bounds the
+# temporary memory replaying takes.
+CHUNK_SIZE = 1 << 20
+
+
+class Journal():
+    """
+    The wall changes of a maze, recorded with start() and stop(), or
+    generator.record(), or read with load().
+
+    While recording, entries are kept in growable typed arrays. stop() turns
+    them into numpy arrays: `cells`, `directions` and `values`, plus
+    `step_starts`, the index of the first entry of each step followed by the
+    number of entries.
+    """
+
+    def __init__(self, maze_type, width, height, initial, step_starts,
+                 cells, directions, values, entrance=None, exit=None):
+        self.maze_cls = mazelib.maze_types[maze_type]
+        self.width = width
+        self.height = height
+        self.initial = initial  # Flat cells before the first step
+        self.step_starts = step_starts
+        self.cells = cells
+        self.directions = directions
+        self.values = values
+        self.entrance = entrance
+        self.exit = exit
+        self.maze = None  # Maze being recorded
+
+    @classmethod
+    def start(cls, maze):
+        """Starts recording the changes made to `maze`."""
+        journal = cls(
+            maze.name, maze.width, maze.height, maze._flat.copy(),
+            array.array("Q", [0]),
+            array.array("I"), array.array("B"), array.array("B"),
+        )
+        journal.maze = maze
+        maze._journal = journal
+        return journal
+
+    def append(self, i, direction, value):
+        self.cells.append(i)
+        self.directions.append(direction)
+        self.values.append(value)
+
+    def append_cells(self, cells, old, new):
+        """Records overwriting the cells at `cells` from `old` to `new`."""
+        cells = numpy.asarray(cells)
+        for d in self.maze_cls.DIRECTIONS:
+            changed = ((old ^ new) & d) != 0
+            n = numpy.count_nonzero(changed)
+            self.cells.frombytes(cells[changed].astype(numpy.uint32).tobytes())
+            self.directions.frombytes(numpy.full(n, d, dtype=numpy.uint8).tobytes())
+            self.values.frombytes(((new[changed] & d) != 0).astype(numpy.uint8).tobytes())
+
+    def end_step(self):
+        self.step_starts.append(len(self.cells))
+
+    def stop(self):
+        """Stops recording. Entries after the last end_step() make a step."""
+        maze = self.maze
+        maze._journal = None
+        self.maze = None
+        self.entrance, self.exit = maze.entrance, maze.exit
+        if len(self.cells) > self.step_starts[-1]:
+            self.end_step()
+
+        self.step_starts = numpy.array(self.step_starts, dtype=numpy.uint64)
+        self.cells = numpy.array(self.cells, dtype=numpy.uint32)
+        self.directions = numpy.array(self.directions, dtype=numpy.uint8)
+        self.values = numpy.array(self.values, dtype=numpy.uint8)
+
+    @property
+    def step_count(self):
+        return len(self.step_starts) - 1
+
+    def maze_at(self, step):
+        """Returns a new maze as it was after `step` steps."""
+        return Replay(self).seek(step)
+
+    ########## Files ##########
+
+    def save(self, path):
+        assert self.maze is None, "Journal is still recording"
+        bits = mazefile.cell_bits(self.maze_cls)
+        entrance = self.entrance or (-1, 0)
+        exit = self.exit or (-1, 0)
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(
+                MAGIC, VERSION, self.maze_cls.name.encode("ascii"),
+                self.width, self.height, self.step_count, len(self.cells),
+                entrance[0], entrance[1], exit[0], exit[1],
+            ))
+            f.write(mazefile.pack_cells(self.initial, bits).tobytes())
+            for data, dtype in ((self.step_starts, "<u8"), (self.cells, "<u4"),
+                                (self.directions, "u1"), (self.values, "u1")):
+                f.write(data.astype(dtype, copy=False).tobytes())
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a journal saved with save(). The file is memory-mapped, so the
+        entries are read-only and only read from disk as they are replayed.
+        """
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, name, width, height, n_steps, n_entries,
+            enter_cell, enter_dir, exit_cell, exit_dir) = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError("Not a maze journal: {}".format(path))
+        if version != VERSION:
+            raise ValueError("Unsupported maze journal version: {}".format(version))
+
+        maze_type = name.rstrip(b"\0").decode("ascii")
+        bits = mazefile.cell_bits(mazelib.maze_types[maze_type])
+        offset = HEADER.size
+        n_cells = width * height
+        packed = numpy.frombuffer(buffer, dtype=numpy.uint8, offset=offset,
+                                  count=mazefile.packed_size(n_cells, bits))
+        initial = mazefile.unpack_cells(packed, n_cells, bits).copy()
+        offset += packed.size
+
+        arrays = []
+        for dtype, count in (("<u8", n_steps+1), ("<u4", n_entries),
+                             ("u1", n_entries), ("u1", n_entries)):
+            arrays.append(numpy.frombuffer(buffer, dtype=dtype, offset=offset,
+                                           count=count))
+            offset += arrays[-1].nbytes
+
+        return cls(
+            maze_type, width, height, initial, *arrays,
+            entrance=(enter_cell, enter_dir) if enter_cell >= 0 else None,
+            exit=(exit_cell, exit_dir) if exit_cell >= 0 else None,
+        )
+
+
+class Replay():
+    """
+    A maze that can be moved to how it was after any step of `journal` with
+    seek(). Seeking forward applies just the entries in between. Seeking
+    back starts over from the snapshot, which costs about as much as seeking
+    forward from the start.
+    """
+
+    def __init__(self, journal):
+        assert journal.maze is None, "Journal is still recording"
+        self.journal = journal
+        cells = journal.initial.reshape(journal.width, journal.height).copy()
+        self.maze = journal.maze_cls(journal.width, journal.height, cells=cells)
+        self.step = 0
+
+    def seek(self, step):
+        """Moves to the maze after `step` steps and returns it."""
+        journal = self.journal
+        assert 0 <= step <= journal.step_count
+        if step < self.step:
+            self.maze._flat[:] = journal.initial
+            self.step = 0
+
+        start = int(journal.step_starts[self.step])
+        stop = int(journal.step_starts[step])
+        apply_entries(self.maze._flat, journal.cells[start:stop],
+                      journal.directions[start:stop], journal.values[start:stop])
+        self.step = step
+
+        # Openings are only known once generation has finished.
+        if step == journal.step_count:
+            self.maze.entrance, self.maze.exit = journal.entrance, journal.exit
+        else:
+            self.maze.entrance = self.maze.exit = None
+        return self.maze
+
+    def iter_steps(self, start=0, stride=1):
+        """Yields the maze after every `stride` steps from `start`."""
+        for step in range(start, self.journal.step_count+1, stride):
+            yield self.seek(step)
+
+
+def apply_entries(flat, cells, directions, values):
+    """
+    Applies journal entries, in order, to a flat array of cells, CHUNK_SIZE
+    entries at a time.
+    """
+    for start in range(0, len(cells), CHUNK_SIZE):
+        c = cells[start:start+CHUNK_SIZE].astype(numpy.intp)
+        d = directions[start:start+CHUNK_SIZE]
+        v = values[start:start+CHUNK_SIZE]
+
+        # Only the last entry for each bit of each cell matters, and once the
+        # others are dropped the order the rest are applied in doesn't.
+        key = c * 256 + d
+        unique, last = numpy.unique(key[::-1], return_index=True)
+        last = len(key) - 1 - last
+        c, d, v = c[last], d[last], v[last]
+
+        # A cell still has an entry per direction, so use unbuffered
+        # operations that apply all of them.
+        numpy.bitwise_and.at(flat, c, ~d)
+        numpy.bitwise_or.at(flat, c[v != 0], d[v != 0])
@@ -1,19 +1,104 @@
 
+import functools
+from multiprocessing.shared_memory import SharedMemory
+
 import numpy
 
+from mazelib import image
+from mazelib.cache import ByteLRU
+
+# Cells rendered at a time by iter_lines(), and pixels rasterized at a time
+# by to_img(), which bound their memory use.
+STR_BAND_CELLS = 1 << 16
+IMG_BAND_PIXELS = 1 << 22
+
+# Per-size tables are shared by mazes of the same size, up to this many bytes
+# of them in all.
+TABLE_CACHE_BYTES = 64 << 20
+
 
 class Maze():
     name = None
     default_enter_side = None
     default_exit_side = None
 
+    # Openings in the outside wall as (cell index, direction), set by the
+    # generator that carves them.
+    entrance = None
+    exit = None
+
+    seed = None  # Seed the maze was generated from, if known
+    min_height = 1  # Fewest rows a maze of this type can have
+
     def opposite_dir(self, direction):
         raise NotImplementedError()
 
     def to_str(self):
         raise NotImplementedError()
 
-    def to_img(self):
+    def str_line_count(self):
+        """Returns the number of lines to_str() gives."""
+        raise NotImplementedError()
+
+    def str_line_range(self, y):
+        """
+        Returns `(start, stop)` of the lines of to_str() that show any wall of
+        a cell in row `y`.
+        """
+        raise NotImplementedError()
+
+    def str_lines(self, start=0, stop=None):
+        """
+        Returns lines `start` up to `stop` of to_str() as a list, rendering
+        only the rows of cells they show.
+        """
+        raise NotImplementedError()
+
+    def iter_lines(self):
+        """
+        Yields the lines of to_str() one at a time. Lines are rendered a band
+        of rows at a time, so memory use only depends on the width.
+        """
+        count = self.str_line_count()
+        band = max(1, STR_BAND_CELLS // self.width)
+        for start in range(0, count, band):
+            yield from self.str_lines(start, start+band)
+
+    def write_str(self, f):
+        """
+        Writes to_str() to the text file object `f`, followed by a newline
+        like print() would, a band of lines at a time as they are rendered.
+        """
+        count = self.str_line_count()
+        band = max(1, STR_BAND_CELLS // self.width)
+        for start in range(0, count, band):
+            lines = self.str_lines(start, start+band)
+            lines.append("")
+            f.write("\n".join(lines))
+
+    def to_img(self, f, cell_size=8, wall_size=1):
+        """
+        Writes the maze to `f`, a path or binary file object, as a black and
+        white PNG image. `cell_size` is the distance in pixels between
+        neighboring cells, and `wall_size` the thickness of the walls.
+
+        The image is rasterized and written a band of rows at a time, so
+        memory use only depends on its width.
+        """
+        width, height = self.img_size(cell_size, wall_size)
+        with image.PngWriter(f, width, height) as png:
+            for pixels in self.iter_img_rows(cell_size, wall_size):
+                png.write_rows(pixels)
+
+    def img_size(self, cell_size=8, wall_size=1):
+        """Returns the `(width, height)` in pixels of to_img()'s image."""
+        raise NotImplementedError()
+
+    def iter_img_rows(self, cell_size=8, wall_size=1):
+        """
+        Yields the pixels of to_img()'s image a band of rows at a time, as
+        bool arrays indexed [y, x] that are True for walls.
+        """
         raise NotImplementedError()
 
     def __getitem__(self, cell_id):
@@ -43,20 +128,36 @@ class Maze():
     def cell_get(self, cell_id):
         return Cell(cell_id, self)
 
+    def cell_index(self, cell_id):
+        """
+        Returns the flat index of `cell_id` into the (width, height) cell
+        grid.
+        """
+        x, y = cell_id
+        return x*self.height + y
+
+    def cell_id_from_index(self, index):
+        return divmod(int(index), self.height)
+
     def cell_get_walls(self, cell_id):
-        raise NotImplementedError()
+        for d in self.DIRECTIONS:
+            yield Wall(cell_id, d, self)
 
     def cell_get_neighbor(self, cell_id, direction):
-        raise NotImplementedError()
+        neighbor = self.neighbor(self.cell_index(cell_id), direction)
+        if neighbor < 0:
+            return None
+        else:
+            return Cell(self.cell_id_from_index(neighbor), self)
 
     def cell_is_on_side(self, cell_id, side_id):
-        return cell_id in map(lambda x: x.cell_id, self.side_get_cells(side_id))
+        return self.side_wall(self.cell_index(cell_id), side_id) != 0
 
     def cell_get_side_wall(self, cell_id, side_id):
-        for wall in self.side_get_walls(side_id):
-            if wall.c1.cell_id == cell_id:
-                return wall
-        return None
+        direction = self.side_wall(self.cell_index(cell_id), side_id)
+        if direction == 0:
+            return None
+        return Wall(cell_id, direction, self)
 
     ########## Walls ##########
 
@@ -64,13 +165,12 @@ class Maze():
         raise NotImplementedError()
 
     def wall_get(self, cell_id, direction):
-        #TODO: Implement this generally.
-        raise NotImplementedError()
+        return self.has_wall(self.cell_index(cell_id), direction)
 
     def wall_opposite_side(self, cell_id, direction):
-        opposite = self.cell_get_neighbor(cell_id, direction)
-        if opposite:
-            opposite_id = opposite.cell_id
+        opposite = self.neighbor(self.cell_index(cell_id), direction)
+        if opposite >= 0:
+            opposite_id = self.cell_id_from_index(opposite)
         else:
             opposite_id = None
         return (
@@ -79,15 +179,216 @@ class Maze():
         )
 
     def wall_set(self, cell_id, direction, set_to=True):
-        raise NotImplementedError()
+        self.set_wall(self.cell_index(cell_id), direction, set_to is True)
 
     def wall_remove(self, cell_id, direction):
         self.wall_set(cell_id, direction, set_to=False)
 
+    ########## Kernel ##########
+    # Low-level API for inner loops, such as generators. Cells are flat
+    # indexes (see cell_index()) and walls are direction bits, so nothing
+    # here creates Cell or Wall objects.
+    #
+    # Subclasses have `_flat`, a flat view of their cell grid, `_neighbors`,
+    # the index of each cell's neighbor in every direction (see
+    # _build_neighbor_table()), `_interior_walls`, the bits of the walls each
+    # cell has a neighbor behind, and `_side_walls`, which maps each side id
+    # to an array of the direction of every cell's exterior wall on that side.
+    # _neighbor_offsets() gives the neighbors as offsets between cell indexes.
+
+    DIRECTIONS = ()  # Wall directions, in bit order
+    ALL_WALLS = 0  # Bits of a cell with every wall set
+
+    _changes = None  # Indexes of changed cells, while tracking changes
+    _journal = None  # journal.Journal recording changes, if any
+
+    # Shared memory block holding the cells, for mazes created with
+    # `shared=True` and their copies in other processes. Pickling a maze
+    # with one only pickles the block's name, so it can be passed to worker
+    # processes which then work on the same cells. Each process should
+    # close() the maze when done with it, and the process that created it
+    # should then call `shared_memory.unlink()` to free the block.
+    shared_memory = None
+
+    def _init_cells(self, cells, shared=False):
+        """
+        `cells` is existing wall bits to use as the maze, without copying:
+        a (width, height) uint8 array, or any buffer of width*height bytes
+        in cell index order, such as a bytearray, an mmap or the `buf` of a
+        `multiprocessing.shared_memory.SharedMemory`. By default all walls
+        are set, in a new array, or in a new shared memory block if `shared`
+        is true (see `Maze.shared_memory`), which can't be given `cells`.
+        """
+        shape = (self.width, self.height)
+        if shared and cells is not None:
+            raise ValueError("Can't use existing cells for a shared maze")
+        if shared:
+            self.shared_memory = SharedMemory(create=True, size=max(self.width*self.height, 1))
+            cells = numpy.frombuffer(self.shared_memory.buf, dtype=numpy.uint8,
+                                     count=self.width*self.height).reshape(shape)
+            cells[:] = self.ALL_WALLS
+        elif cells is None:
+            cells = numpy.full(shape, self.ALL_WALLS, dtype=numpy.uint8)
+        elif not isinstance(cells, numpy.ndarray):
+            cells = numpy.frombuffer(cells, dtype=numpy.uint8,
+                                     count=self.width*self.height).reshape(shape)
+        self._set_cells(cells)
+
+    # Per-size tables are only built once they are needed, since they are
+    # several times the size of the cells. Subclasses build them in
+    # _neighbor_table(), _interior_wall_table() and _side_wall_table().
+    @functools.cached_property
+    def _neighbors(self):
+        return self._neighbor_table()
+
+    @functools.cached_property
+    def _interior_walls(self):
+        return self._interior_wall_table()
+
+    @functools.cached_property
+    def _side_walls(self):
+        return self._side_wall_table()
+
+    def _set_cells(self, cells):
+        assert cells.shape == (self.width, self.height)
+        assert cells.dtype == numpy.uint8
+        assert cells.flags.c_contiguous
+        self._cells = cells
+        self._flat = cells.reshape(-1)
+
+    def close(self):
+        """
+        Releases the maze's shared memory block, after which the maze can't
+        be used. There must be no other views of its cells left.
+        """
+        if self.shared_memory is not None:
+            self._cells = self._flat = None
+            self.shared_memory.close()
+
+    def __getstate__(self):
+        # Lookup tables are rebuilt rather than pickled, and shared cells are
+        # passed by name.
+        state = {
+            key: value for key, value in self.__dict__.items()
+            if key not in ("_cells", "_flat", "_neighbors", "_interior_walls",
+                           "_side_walls", "_changes", "_journal", "shared_memory")
+        }
+        if self.shared_memory is not None:
+            state["shared_memory"] = self.shared_memory.name
+        else:
+            state["_cells"] = self._cells
+        return state
+
+    def __setstate__(self, state):
+        cells = state.pop("_cells", None)
+        name = state.pop("shared_memory", None)
+        if name is not None:
+            self.shared_memory = SharedMemory(name=name)
+            cells = self.shared_memory.buf
+        self.__init__(state["width"], state["height"], cells=cells)
+        self.__dict__.update(state)
+
+    def cell_count(self):
+        return self._flat.size
+
+    def neighbor(self, i, direction):
+        """
+        Returns the index of the neighbor of cell `i` in `direction`, or -1
+        if there isn't one.
+        """
+        return int(self._neighbors[i, direction.bit_length()-1])
+
+    def neighbors(self, i):
+        """
+        Returns a list of `(direction, neighbor index)` pairs, one for each
+        neighbor of cell `i`.
+        """
+        return [(d, j) for d, j in zip(self.DIRECTIONS, self._neighbors[i].tolist())
+                if j >= 0]
+
+    def side_wall(self, i, side_id):
+        """
+        Returns the direction of cell `i`'s exterior wall on side `side_id`,
+        or 0 if the cell isn't on that side. When a cell has more than one
+        wall on a side, this is the first one side_get_walls() gives.
+        """
+        return int(self._side_walls[side_id][i])
+
+    def has_wall(self, i, direction):
+        return bool(self._flat[i] & direction)
+
+    def set_wall(self, i, direction, set_to=True):
+        j = self._neighbors[i, direction.bit_length()-1]
+        opposite = self.OPPOSITE_DIR[direction]
+        if self._changes is not None:
+            self._changes.append(i)
+            if j >= 0:
+                self._changes.append(int(j))
+        if self._journal is not None:
+            self._journal.append(i, direction, set_to)
+            if j >= 0:
+                self._journal.append(j, opposite, set_to)
+        if set_to:
+            self._flat[i] |= direction
+            if j >= 0:
+                self._flat[j] |= opposite
+        else:
+            self._flat[i] &= ~direction & self.ALL_WALLS
+            if j >= 0:
+                self._flat[j] &= ~opposite & self.ALL_WALLS
+
+    def remove_wall(self, i, direction):
+        self.set_wall(i, direction, False)
+
+    def set_cells(self, cells, values):
+        """
+        Overwrites all the wall bits of the cells at indexes `cells` with
+        `values`. Keeping neighbors consistent is up to the caller. Use this
+        rather than writing to `_cells` so the changes are tracked.
+        """
+        if self._journal is not None:
+            self._journal.append_cells(cells, self._flat[cells], values)
+        self.mark_changed(cells)
+        self._flat[cells] = values
+
+    def set_rows(self, start, rows):
+        """
+        Overwrites the rows of cells from `start` with `rows`, indexed
+        [x, y-start], like set_cells(). Unless changes are being tracked, this
+        is a plain write into `_cells`.
+        """
+        stop = start + rows.shape[1]
+        if self._journal is None and self._changes is None:
+            self._cells[:, start:stop] = rows
+            return
+        cells = numpy.arange(self.width)[:, None]*self.height + numpy.arange(start, stop)
+        self.set_cells(cells.reshape(-1), rows.reshape(-1))
+
+    def track_changes(self, enable=True):
+        """
+        Starts (or stops) recording the index of every cell set_wall()
+        changes, to be collected with pop_changes(). Code that writes to
+        `_cells` directly records its changes with mark_changed().
+        """
+        self._changes = [] if enable else None
+
+    def mark_changed(self, cells):
+        if self._changes is not None:
+            self._changes.extend(cells)
+
+    def pop_changes(self):
+        """
+        Returns the indexes of the cells changed since the last call, which
+        may repeat, and forgets them.
+        """
+        changes, self._changes = self._changes, []
+        return changes
+
 
 #################### Helper Classes ####################
 
 class Side():
+    __slots__ = ("side_id", "maze")
 
     def __init__(self, side_id, maze):
         assert side_id is not None
@@ -105,6 +406,7 @@ class Side():
 
 
 class Cell():
+    __slots__ = ("cell_id", "maze")
 
     def __init__(self, cell_id, maze):
         assert cell_id is not None
@@ -149,20 +451,25 @@ class Cell():
 
 
 class Wall():
+    __slots__ = ("c1_id", "d1", "c2_id", "d2", "maze")
 
     def __init__(self, cell_id, direction, maze):
         assert cell_id is not None
         assert direction is not None
 
         self.c1_id = cell_id
-        self.c1 = Cell(cell_id, maze)
         self.d1 = direction
-
         self.c2_id, self.d2 = maze.wall_opposite_side(cell_id, direction)
-        self.c2 = Cell(self.c2_id, maze) if self.c2_id else None
-
         self.maze = maze
 
+    @property
+    def c1(self):
+        return Cell(self.c1_id, self.maze)
+
+    @property
+    def c2(self):
+        return Cell(self.c2_id, self.maze) if self.c2_id else None
+
     def __bool__(self):
         return self.get()
 
@@ -189,6 +496,8 @@ class Wall():
 class RectMaze(Maze):
     name = "rect"
     N, S, E, W = (1, 2, 4, 8)  # North, South, East West
+    DIRECTIONS = (N, S, E, W)
+    ALL_WALLS = N | S | E | W
     OPPOSITE_DIR = {
         N: S,
         S: N,
@@ -221,20 +530,38 @@ class RectMaze(Maze):
         N|S|E|W: '┼',
     }
 
+    # WALL_CHARS as an array of code points, for vectorized rendering.
+    WALL_CODEPOINTS = numpy.array(
+        [ord(c) for code, c in sorted(WALL_CHARS.items())],
+        dtype="<u4"
+    )
+
     side_ids = set((N, S, E, W))
     default_enter_side = N
     default_exit_side = S
 
-    def __init__(self, width, height):
+    def __init__(self, width, height, cells=None, shared=False):
         self.width = width
         self.height = height
 
-        default_cell = self.N | self.S | self.E | self.W
-        self._cells = numpy.array(
-            [[default_cell for y in range(self.height)]
-                           for x in range(self.width)],
-            dtype=numpy.uint8
-        )
+        self._init_cells(cells, shared)
+
+    def _neighbor_table(self):
+        return _rect_neighbor_table(self.width, self.height)
+
+    def _interior_wall_table(self):
+        return _rect_interior_walls(self.width, self.height)
+
+    def _neighbor_offsets(self):
+        """
+        Returns `(rows, offsets)`, where cell i's neighbor in direction bit k,
+        if it has one, is cell i + offsets[rows[i], k].
+        """
+        rows = numpy.broadcast_to(numpy.uint8(0), (self.cell_count(),))
+        return rows, _build_offset_table(self.height, [self.DELTAS], self.DIRECTIONS)
+
+    def _side_wall_table(self):
+        return _rect_side_walls(self.width, self.height)
 
     def opposite_dir(self, direction):
         return self.OPPOSITE_DIR[direction]
@@ -243,30 +570,121 @@ class RectMaze(Maze):
         return x>=0 and y>=0 and x<self.width and y<self.height
 
     def to_str(self):
-        s = []
-        for y in range(-1, self.height):
-            for x in range(-1, self.width):
-
-                #TODO: Probably unnessesary to check all 4 surrounding cells,
-                #      but I wanted to be careful around the corners/edges of
-                #      the maze.
-                a = 0
-                if self.in_bounds(x, y):
-                    if self._cells[x,y] & self.E: a |= self.N
-                    if self._cells[x,y] & self.S: a |= self.W
-                if self.in_bounds(x+1, y):
-                    if self._cells[x+1,y] & self.W: a |= self.N
-                    if self._cells[x+1,y] & self.S: a |= self.E
-                if self.in_bounds(x, y+1):
-                    if self._cells[x,y+1] & self.E: a |= self.S
-                    if self._cells[x,y+1] & self.N: a |= self.W
-                if self.in_bounds(x+1, y+1):
-                    if self._cells[x+1,y+1] & self.W: a |= self.S
-                    if self._cells[x+1,y+1] & self.N: a |= self.E
-
-                s.append(self.WALL_CHARS[a])
-            s.append("\n")
-        return ''.join(s[:-1])
+        padded = numpy.zeros((self.width+2, self.height+2), dtype=numpy.uint8)
+        padded[1:-1, 1:-1] = self._cells
+        return self._render_junctions(self._junction_codes(padded))
+
+    def str_line_count(self):
+        return self.height + 1
+
+    def str_line_range(self, y):
+        # Line y has the corners above row y and line y+1 those below it.
+        return y, y+2
+
+    def str_lines(self, start=0, stop=None):
+        count = self.str_line_count()
+        stop = count if stop is None else min(stop, count)
+        if start >= stop:
+            return []
+
+        return self._render_junctions(self._corner_codes(start, stop)).split("\n")
+
+    def _corner_codes(self, start, stop):
+        """
+        Junction codes (see _junction_codes()) of the rows of lattice
+        corners `start` up to `stop`, indexed [x, y-start]. Row k is the
+        corners between rows of cells k-1 and k, which line k of to_str()
+        shows.
+        """
+        # Only those rows of cells are needed, with a border of wall-less
+        # cells.
+        window = numpy.zeros((self.width+2, stop-start+1), dtype=numpy.uint8)
+        y0, y1 = max(start-1, 0), min(stop, self.height)
+        window[1:-1, y0-start+1:y1-start+1] = self._cells[:, y0:y1]
+        return self._junction_codes(window)
+
+    def img_size(self, cell_size=8, wall_size=1):
+        return (self.width*cell_size + wall_size,
+                self.height*cell_size + wall_size)
+
+    def iter_img_rows(self, cell_size=8, wall_size=1):
+        assert 0 < wall_size < cell_size
+        width, height = self.img_size(cell_size, wall_size)
+        sprites = _rect_corner_sprites(cell_size, wall_size)
+
+        # Each row of corners is the top left of a cell_size square of pixels
+        # per corner, so looking up the squares of the corners' junction codes
+        # and laying them side by side draws the walls.
+        count = self.height + 1
+        band = max(1, IMG_BAND_PIXELS // (width*cell_size))
+        for start in range(0, count, band):
+            stop = min(start+band, count)
+            squares = sprites[self._corner_codes(start, stop).T]
+            pixels = squares.transpose(0, 2, 1, 3).reshape(
+                (stop-start)*cell_size, -1
+            )
+            # The last column and row of corners are only wall_size wide.
+            yield pixels[:height - start*cell_size, :width]
+
+    @classmethod
+    def iter_row_lines(cls, rows):
+        """
+        Renders a maze given as an iterable of rows, each an array of cells
+        like `_cells[:, y]`, yielding lines of the same text to_str() gives.
+        Each line is yielded as soon as the rows it depends on are known, so
+        memory stays proportional to the width however many rows there are.
+        """
+        window = None
+        for row in rows:
+            if window is None:
+                # Cells of the row above and the current row, with a border of
+                # wall-less cells.
+                window = numpy.zeros((len(row)+2, 2), dtype=numpy.uint8)
+            window[1:-1, 1] = row
+            yield cls._render_junctions(cls._junction_codes(window))
+            window[:, 0] = window[:, 1]
+
+        if window is not None:
+            window[:, 1] = 0
+            yield cls._render_junctions(cls._junction_codes(window))
+
+    @classmethod
+    def _junction_codes(cls, padded):
+        """
+        Returns the N|S|E|W code of the wall lines meeting at each lattice
+        corner, given cells surrounded by a border of wall-less cells.
+
+        `padded[x+1, y+1]` is cell (x, y), and the result is indexed the same
+        way by the corner at the bottom right of that cell, so it is one
+        smaller than `padded` in each dimension.
+        """
+        N, S, E, W = cls.N, cls.S, cls.E, cls.W
+
+        # The four cells around each corner
+        nw = padded[:-1, :-1]
+        ne = padded[1:, :-1]
+        sw = padded[:-1, 1:]
+        se = padded[1:, 1:]
+
+        # Move each cell's wall bit to the bit of the corner line it draws.
+        # For example, the east wall of the north west cell is the north line
+        # of the corner: E (4) shifted right by 2 is N (1).
+        return (
+            (nw & E) >> 2 | (ne & W) >> 3 |  # N
+            (sw & E) >> 1 | (se & W) >> 2 |  # S
+            (ne & S) << 1 | (se & N) << 2 |  # E
+            (nw & S) << 2 | (sw & N) << 3    # W
+        )
+
+    @classmethod
+    def _render_junctions(cls, codes):
+        """
+        Renders junction codes, indexed [x, y], to lines of text.
+        """
+        lines = numpy.empty((codes.shape[1], codes.shape[0]+1), dtype="<u4")
+        lines[:, :-1] = cls.WALL_CODEPOINTS[codes.T]
+        lines[:, -1] = ord("\n")
+        return lines.tobytes()[:-4].decode("utf-32-le")
 
     ########## Sides ##########
 
@@ -281,6 +699,22 @@ class RectMaze(Maze):
             for y in range(self.height):
                 yield Wall((x, y), side_id, self)
 
+    def close_outer_walls(self):
+        """
+        Sets every exterior wall, closing the entrance, exit and any other
+        openings. Unless changes are being tracked, this is a plain write into
+        `_cells`.
+        """
+        tracked = self._journal is not None or self._changes is not None
+        cells = self._cells.copy() if tracked else self._cells
+        cells[:, 0] |= self.N
+        cells[:, -1] |= self.S
+        cells[0, :] |= self.W
+        cells[-1, :] |= self.E
+        if tracked:
+            changed = numpy.flatnonzero(cells.reshape(-1) != self._flat)
+            self.set_cells(changed, cells.reshape(-1)[changed])
+
     ########## Cells ##########
 
     def cells_get_all(self):
@@ -288,18 +722,6 @@ class RectMaze(Maze):
             for x in range(self.width):
                 yield Cell((x, y), self)
 
-    def cell_get_walls(self, cell_id):
-        for d in self.side_ids:
-            yield Wall(cell_id, d, self)
-
-    def cell_get_neighbor(self, cell_id, direction):
-        x, y = cell_id
-        dx, dy = self.DELTAS[direction]
-        if not self.in_bounds(x+dx, y+dy):
-            return None
-        else:
-            return Cell((x+dx, y+dy), self)
-
     ########## Walls ##########
 
     def walls_get_all(self):
@@ -314,30 +736,60 @@ class RectMaze(Maze):
         for y in range(self.height-1):
             yield Wall((self.width-1, y), self.S, self)
 
-    def wall_get(self, cell_id, direction):
-        return self._cells[cell_id] & direction > 0
 
-    def wall_set(self, cell_id, direction, set_to=True):
-        if set_to is True:
-            self._cells[cell_id] |= direction
-        else:
-            self._cells[cell_id] &= ~direction & 0xf
-
-        new_coordinates = tuple(numpy.array(cell_id) + self.DELTAS[direction])
-        if self.in_bounds(*new_coordinates):
-            if set_to is True:
-                self._cells[new_coordinates] |= self.opposite_dir(direction)
-            else:
-                self._cells[new_coordinates] &= ~self.opposite_dir(direction) & 0xf
+def _table_bytes(table):
+    if isinstance(table, dict):
+        return sum(t.nbytes for t in table.values())
+    return table.nbytes
+
+_tables = ByteLRU(TABLE_CACHE_BYTES, size=_table_bytes)
+
+def _shared_table(func):
+    """
+    Caches the per-size table `func(width, height)` in `_tables`, so mazes
+    of the same size share it while it fits.
+    """
+    @functools.wraps(func)
+    def wrapper(width, height):
+        key = (func.__name__, width, height)
+        table = _tables.get(key)
+        if table is None:
+            table = _tables.put(key, func(width, height))
+        return table
+    return wrapper
+
+@_shared_table
+def _rect_neighbor_table(width, height):
+    return _build_neighbor_table(width, height, RectMaze.DIRECTIONS, _rect_delta)
+
+@_shared_table
+def _rect_interior_walls(width, height):
+    return _build_interior_walls(width, height, RectMaze.DIRECTIONS, _rect_delta)
+
+def _rect_delta(direction, ys):
+    return RectMaze.DELTAS[direction]
+
+@_shared_table
+def _rect_side_walls(width, height):
+    N, S, E, W = RectMaze.N, RectMaze.S, RectMaze.E, RectMaze.W
+    xs, ys = _cell_coordinates(width, height)
+    return _read_only({
+        N: numpy.where(ys == 0, N, 0),
+        S: numpy.where(ys == height-1, S, 0),
+        E: numpy.where(xs == width-1, E, 0),
+        W: numpy.where(xs == 0, W, 0),
+    })
 
 
 #################### HexMaze ####################
 
 class HexMaze(Maze):
     name = "hex"
+    min_height = 2
     N, S, NE, NW, SE, SW = (1, 2, 4, 8, 16, 32)
     E, W = (64, 128)  # Used for sides, not wall directions
-    DIRECTIONS = set((N, S, NE, NW, SE, SW))
+    DIRECTIONS = (N, S, NE, NW, SE, SW)
+    ALL_WALLS = N | S | NE | NW | SE | SW
     OPPOSITE_DIR = {
         N: S,
         S: N,
@@ -349,12 +801,18 @@ class HexMaze(Maze):
         SE: NW,
     }
 
+    # (dx, dy) to the neighbor in each direction, for even and odd rows.
+    DELTAS = (
+        {N: (0, -2), S: (0, 2), NE: (0, -1), SW: (-1, 1), NW: (-1, -1), SE: (0, 1)},
+        {N: (0, -2), S: (0, 2), NE: (1, -1), SW: (0, 1), NW: (0, -1), SE: (1, 1)},
+    )
+
     side_ids = set((N, S, E, W))
     default_enter_side = N
     default_exit_side = S
 
-    def __init__(self, width, height):
-        assert height > 1
+    def __init__(self, width, height, cells=None, shared=False):
+        assert height >= self.min_height
         self.width = width
         self.height = height
 
@@ -365,12 +823,20 @@ class HexMaze(Maze):
         # ╱0,2╲___╱1,2╲___╱2,2╲___╱
         # ╲___╱   ╲___╱   ╲___╱
         #            ...
-        default_cell = self.N | self.S | self.NE | self.NW | self.SE | self.SW
-        self._cells = numpy.array(
-            [[default_cell for y in range(self.height)]
-                           for x in range(self.width)],
-            dtype=numpy.uint8
-        )
+        self._init_cells(cells, shared)
+
+    def _neighbor_table(self):
+        return _hex_neighbor_table(self.width, self.height)
+
+    def _interior_wall_table(self):
+        return _hex_interior_walls(self.width, self.height)
+
+    def _neighbor_offsets(self):
+        rows = _hex_row_parity(self.width, self.height)
+        return rows, _build_offset_table(self.height, self.DELTAS, self.DIRECTIONS)
+
+    def _side_wall_table(self):
+        return _hex_side_walls(self.width, self.height)
 
     def opposite_dir(self, direction):
         return self.OPPOSITE_DIR[direction]
@@ -379,73 +845,133 @@ class HexMaze(Maze):
         return x>=0 and y>=0 and x<self.width and y<self.height
 
     def get_direction_delta(self, direction, y):
-        if   direction == self.N:  return (0, -2)
-        elif direction == self.S:  return (0, 2)
-        elif direction == self.NE: return (1 if y&1 else 0, -1)
-        elif direction == self.SW: return (0 if y&1 else -1, 1)
-        elif direction == self.NW: return (0 if y&1 else -1, -1)
-        elif direction == self.SE: return (1 if y&1 else 0, 1)
+        return self.DELTAS[y&1][direction]
 
     def to_str(self):
-        s = []  # Result string
-
-        # Print wall
-        # Shortcut for conditional appending to the result.
-        # If Wall((x, y), direction) is set, add if_set to the result
-        # string s, otherwise add if_unset.
-        def p(x, y, direction, if_set, if_unset=""):
-            assert self.in_bounds(x, y)
-            if self._cells[x, y] & direction:
-                s.append(if_set)
-            else:
-                s.append(if_unset)
-
-        # Shortcut vars
+        return "\n".join(self.str_lines())
+
+    def img_size(self, cell_size=8, wall_size=1):
+        a, h = _hex_img_units(cell_size, wall_size)
+        return 6*a*self.width + a + wall_size, h*(self.height+1) + wall_size
+
+    def iter_img_rows(self, cell_size=8, wall_size=1):
+        a, h = _hex_img_units(cell_size, wall_size)
+        width, height = self.img_size(cell_size, wall_size)
+        sprites = _hex_sprites(a, h, wall_size)
+
+        # A cell's sprite is 6a by 4h, and the box its walls are drawn in
+        # starts at (6a*x + 3a*(y&1), h*y). Boxes of rows 4 apart are laid out
+        # without overlapping, so rows are drawn in 4 groups by y % 4, each
+        # by looking up the cells' sprites and laying them side by side.
+        # Boxes reach into the rows of the next band, which are carried over.
+        rows = max(4, IMG_BAND_PIXELS // (width*h) // 4 * 4)
+        band_height = h*rows + 4*h
+        band_width = 6*a*self.width + 3*a
+        carry = numpy.zeros((0, band_width), dtype=bool)
+        for y0 in range(0, self.height, rows):
+            y1 = min(y0+rows, self.height)
+            band = numpy.zeros((band_height, band_width), dtype=bool)
+            band[:len(carry)] = carry
+            for group in range(4):
+                ys = numpy.arange(y0+group, y1, 4)
+                if not len(ys):
+                    continue
+                tiles = sprites[self._cells[:, ys].T]
+                tiles = tiles.transpose(0, 2, 1, 3).reshape(len(ys)*4*h, -1)
+                x = 3*a*(group & 1)
+                band[h*group:h*group+len(tiles), x:x+tiles.shape[1]] |= tiles
+
+            done = h*(y1-y0) if y1 < self.height else height - h*y0
+            yield band[:done, :width]
+            carry = band[done:]
+
+    def str_line_count(self):
+        return self.height + 2
+
+    def str_line_range(self, y):
+        # Neighbors share the lines their common walls are drawn on, which
+        # puts the walls of row y on lines y to y+2.
+        return y, min(y+3, self.str_line_count())
+
+    def str_lines(self, start=0, stop=None):
         w, h = self.width, self.height
         N, NW, NE = self.N, self.NW, self.NE
         S, SW, SE = self.S, self.SW, self.SE
-
-        # First Row
-        s.append(" ")
-        for x in range(w):
-            p(x, 0, N, "__    ", "      ")
-        s.append("\n")
-
-        for y in range(0, h, 2):
+        count = self.str_line_count()
+        stop = count if stop is None else min(stop, count)
+        if start >= stop:
+            return []
+
+        # Line 1+y is the top of even row y and line 2+y its bottom. Only
+        # render the even rows with a line in range.
+        y0 = max(start-2, 0)
+        y0 += y0 & 1
+        ys = numpy.arange(y0, min(stop-1, h), 2)
+        if len(ys):
+            even = self._cells[:, ys]  # Columns are x, rows are (y-y0)/2
+
+            # Top of each even row hexagon is the bottom of the odd row cell
+            # above it. The first row has no cell above, so use the cell below.
+            top = numpy.where(
+                ys > 0, self._cells[:, ys-1], (self._cells[:, 1:2] & N) * S
+            )
+
+            top_lines = _render_segments(
+                (even, NW, "╱  ", "   "),
+                (even, NE, "╲", " "),
+                (top, S, "__", "  "),
+            )
+            bottom_lines = _render_segments(
+                (even, SW, "╲", " "),
+                (even, S, "__", "  "),
+                (even, SE, "╱", " "),
+                (None, None, "  ", "  "),
+            )
+
+        # Trailing east side walls of the odd rows, which only get a
+        # character if the wall is present. Lines start to stop use rows
+        # start-2 to stop-2.
+        e0 = max(start-2, 0)
+        east = self._cells[w-1, e0:stop]
+        east_se = numpy.where(east & SE, ord("╱"), 0)
+        east_ne = numpy.where(east & NE, ord("╲"), 0)
+
+        lines = []
+        for k in range(start, stop):
+
+            # First row
+            if k == 0:
+                parts = [_codepoints(" "), _render_segments(
+                    (self._cells[:, :1], N, "__    ", "      "),
+                )[0]]
+
+            # Last row
+            elif k == h+1 and h&1 == 0:  # Num rows is even
+                parts = [_codepoints(" "), _render_segments(
+                    (None, None, "  ", "  "),
+                    (self._cells[:, h-1:], SW, "╲", " "),
+                    (self._cells[:, h-1:], S, "__", "  "),
+                    (self._cells[:, h-1:], SE, "╱", " "),
+                )[0]]
 
             # Top of even rows
-            for x in range(w):
-                p(x, y, NW, "╱  ", "   ")
-                p(x, y, NE, "╲", " ")
-                if y > 0:
-                    p(x, y-1, S, "__", "  ")
-                else:
-                    p(x, y+1, N, "__", "  ")
-            if y > 0:
-                p(w-1, y-1, SE, "╱")
-            s.append("\n")
+            elif k & 1:
+                y = k-1
+                parts = [top_lines[(y-y0)//2]]
+                if y > 0 and east_se[y-1-e0]:
+                    parts.append(east_se[y-1-e0:y-e0])
 
             # Bottom of even rows
-            for x in range(w):
-                p(x, y, SW, "╲", " ")
-                p(x, y, S, "__", "  ")
-                p(x, y, SE, "╱", " ")
-                s.append("  ")
-            if y+1 < h:
-                p(x, y+1, NE, "╲")
-            s.append("\n")
-
-        # Last row
-        if h&1 == 0:  # Num rows is even
-            s.append(" ")
-            for x in range(w):
-                s.append("  ")
-                p(x, h-1, SW, "╲", " ")
-                p(x, h-1, S, "__", "  ")
-                p(x, h-1, SE, "╱", " ")
-            s.append("\n")
-
-        return ''.join(s[:-1])
+            else:
+                y = k-2
+                parts = [bottom_lines[(y-y0)//2]]
+                if y+1 < h and east_ne[y+1-e0]:
+                    parts.append(east_ne[y+1-e0:y+2-e0])
+
+            codepoints = numpy.concatenate(parts).astype("<u4")
+            lines.append(codepoints.tobytes().decode("utf-32-le"))
+
+        return lines
 
     ########## Sides ##########
 
@@ -486,18 +1012,6 @@ class HexMaze(Maze):
             for x in range(self.width):
                 yield Cell((x, y), self)
 
-    def cell_get_walls(self, cell_id):
-        for d in self.DIRECTIONS:
-            yield Wall(cell_id, d, self)
-
-    def cell_get_neighbor(self, cell_id, direction):
-        x, y = cell_id
-        dx, dy = self.get_direction_delta(direction, y)
-        if not self.in_bounds(x+dx, y+dy):
-            return None
-        else:
-            return Cell((x+dx, y+dy), self)
-
     ########## Walls ##########
 
     def walls_get_all(self):
@@ -518,19 +1032,198 @@ class HexMaze(Maze):
         # Bottom wall
         yield from self.side_get_walls(self.S)
 
-    def wall_get(self, cell_id, direction):
-        return self._cells[cell_id] & direction > 0
-
-    def wall_set(self, c1_id, d1, set_to=True):
-        c2 = self.cell_get_neighbor(c1_id, d1)
-        c2_id = c2.cell_id if c2 else None
-        d2 = self.opposite_dir(d1)
 
-        if set_to is True:
-            self._cells[c1_id] |= d1
-            if c2:
-                self._cells[c2_id] |= d2
-        else:
-            self._cells[c1_id] &= ~d1 & 0x3f
-            if c2:
-                self._cells[c2_id] &= ~d2 & 0x3f
+@_shared_table
+def _hex_neighbor_table(width, height):
+    return _build_neighbor_table(width, height, HexMaze.DIRECTIONS, _hex_delta)
+
+@_shared_table
+def _hex_interior_walls(width, height):
+    return _build_interior_walls(width, height, HexMaze.DIRECTIONS, _hex_delta)
+
+def _hex_delta(direction, ys):
+    even, odd = HexMaze.DELTAS[0][direction], HexMaze.DELTAS[1][direction]
+    return (
+        numpy.where(ys & 1, odd[0], even[0]),
+        numpy.where(ys & 1, odd[1], even[1]),
+    )
+
+@_shared_table
+def _hex_row_parity(width, height):
+    xs, ys = _cell_coordinates(width, height)
+    parity = (ys & 1).astype(numpy.uint8)
+    parity.flags.writeable = False
+    return parity
+
+@_shared_table
+def _hex_side_walls(width, height):
+    N, S, E, W = HexMaze.N, HexMaze.S, HexMaze.E, HexMaze.W
+    NE, NW, SW = HexMaze.NE, HexMaze.NW, HexMaze.SW
+    xs, ys = _cell_coordinates(width, height)
+
+    # Must match the first wall side_get_walls() gives for each cell.
+    return _read_only({
+        N: numpy.where(ys == 0, NW, numpy.where(ys == 1, N, 0)),
+        S: numpy.where(ys == height-1, SW, numpy.where(ys == height-2, S, 0)),
+        W: numpy.where((xs == 0) & (ys & 1 == 0), NW, 0),
+        E: numpy.where((xs == width-1) & (ys & 1 == 1), NE, 0),
+    })
+
+
+#################### Cell Tables ####################
+# Per-size lookup tables, indexed by flat cell index. They are shared
+# between mazes of the same type and size, so they are made read-only.
+
+def _cell_coordinates(width, height):
+    """Returns flat arrays of the x and y coordinate of every cell."""
+    xs, ys = numpy.meshgrid(
+        numpy.arange(width), numpy.arange(height), indexing="ij"
+    )
+    return xs.reshape(-1), ys.reshape(-1)
+
+def _read_only(side_walls):
+    for side_id, table in side_walls.items():
+        side_walls[side_id] = table.astype(numpy.uint8)
+        side_walls[side_id].flags.writeable = False
+    return side_walls
+
+def _build_neighbor_table(width, height, directions, get_delta):
+    """
+    Returns an array of the flat index of every cell's neighbor in each
+    direction, or -1 where there is no neighbor, indexed by [cell index,
+    direction bit number]. `get_delta(direction, ys)` gives the (dx, dy) to
+    the neighbor in `direction`, for cells in rows `ys`.
+    """
+    xs, ys = _cell_coordinates(width, height)
+    table = numpy.full((width*height, len(directions)), -1, dtype=numpy.intp)
+    for d in directions:
+        dx, dy = get_delta(d, ys)
+        nx, ny = xs+dx, ys+dy
+        in_bounds = (nx >= 0) & (ny >= 0) & (nx < width) & (ny < height)
+        table[:, d.bit_length()-1] = numpy.where(in_bounds, nx*height + ny, -1)
+
+    table.flags.writeable = False
+    return table
+
+def _build_interior_walls(width, height, directions, get_delta):
+    """
+    Returns an array of the bits of the walls of every cell that have a
+    neighbor behind them. See _build_neighbor_table() for `get_delta`.
+    """
+    xs, ys = _cell_coordinates(width, height)
+    walls = numpy.zeros(width*height, dtype=numpy.uint8)
+    for d in directions:
+        dx, dy = get_delta(d, ys)
+        nx, ny = xs+dx, ys+dy
+        walls[(nx >= 0) & (ny >= 0) & (nx < width) & (ny < height)] |= d
+
+    walls.flags.writeable = False
+    return walls
+
+def _build_offset_table(height, deltas, directions):
+    """
+    Returns an array of the difference between the flat index of a cell and
+    its neighbor's in each direction, indexed [row kind, direction bit
+    number], where `deltas[row kind]` maps directions to (dx, dy).
+    """
+    return numpy.array([
+        [delta[d][0]*height + delta[d][1] for d in directions]
+        for delta in deltas
+    ], dtype=numpy.intp)
+
+
+#################### Rendering Helpers ####################
+
+@functools.lru_cache()
+def _rect_corner_sprites(cell_size, wall_size):
+    """
+    The cell_size square of pixels to the bottom right of a lattice corner,
+    for each junction code, as a bool array indexed [code, y, x]. The corner
+    itself is drawn if any walls meet there, and the walls going east and
+    south from it if the code has them.
+    """
+    N, S, E, W = RectMaze.N, RectMaze.S, RectMaze.E, RectMaze.W
+    codes = numpy.arange(16)[:, None, None]
+    line = numpy.arange(cell_size) < wall_size
+    line_y, line_x = line[:, None], line[None, :]
+    sprites = (
+        (line_y & line_x & (codes != 0))
+        | (line_y & ~line_x & ((codes & E) != 0))
+        | (~line_y & line_x & ((codes & S) != 0))
+    )
+    sprites.flags.writeable = False
+    return sprites
+
+def _hex_img_units(cell_size, wall_size):
+    """
+    Returns `(a, h)`: a hexagon is 4a pixels wide and 2h high, where h is
+    half the cell_size and a as near as possible to h/sqrt(3), so it is
+    close to regular.
+    """
+    h = cell_size // 2
+    a = max(1, round(h / 3**0.5))
+    assert 0 < wall_size <= min(2*a, 2*h)
+    return a, h
+
+@functools.lru_cache()
+def _hex_sprites(a, h, wall_size):
+    """
+    The walls of a hexagon for each combination of wall bits, as a bool
+    array indexed [bits, y, x] with the hexagon's corners at x 0, a, 3a and
+    4a, and y 0, h and 2h. The sprites are padded to 6a by 4h.
+    """
+    N, S, NE, NW, SE, SW = (HexMaze.N, HexMaze.S, HexMaze.NE, HexMaze.NW,
+                            HexMaze.SE, HexMaze.SW)
+    # Every edge runs from top to bottom, so an edge and the same edge of the
+    # neighbor on its other side round to the same pixels.
+    edges = {
+        N: ((a, 0), (3*a, 0)),
+        S: ((a, 2*h), (3*a, 2*h)),
+        NE: ((3*a, 0), (4*a, h)),
+        SE: ((4*a, h), (3*a, 2*h)),
+        NW: ((a, 0), (0, h)),
+        SW: ((0, h), (a, 2*h)),
+    }
+    codes = numpy.arange(HexMaze.ALL_WALLS+1)
+    sprites = numpy.zeros((len(codes), 4*h, 6*a), dtype=bool)
+    for d, ((x0, y0), (x1, y1)) in edges.items():
+        t = numpy.linspace(0, 1, max(abs(x1-x0), abs(y1-y0)) + 1)
+        xs = numpy.rint(x0 + t*(x1-x0)).astype(numpy.intp)
+        ys = numpy.rint(y0 + t*(y1-y0)).astype(numpy.intp)
+        edge = numpy.zeros((4*h, 6*a), dtype=bool)
+        for dy in range(wall_size):
+            for dx in range(wall_size):
+                edge[ys+dy, xs+dx] = True
+        sprites[(codes & d) != 0] |= edge
+
+    sprites.flags.writeable = False
+    return sprites
+
+def _codepoints(s):
+    return numpy.frombuffer(s.encode("utf-32-le"), dtype="<u4")
+
+def _render_segments(*segments):
+    """
+    Renders rows of fixed-width segments, one per cell, to code points.
+
+    Each segment is `(cells, direction, if_set, if_unset)`, where `cells` is a
+    2D array indexed [x, row]. For every cell, `if_set` is drawn if the wall in
+    `direction` is present and `if_unset` otherwise, which must be the same
+    length. Use a `cells` of None for a segment that is always `if_set`.
+
+    Returns an array of code points indexed [row, character].
+    """
+    columns = []
+    for cells, direction, if_set, if_unset in segments:
+        set_points = _codepoints(if_set)
+        if cells is None:
+            columns.append(set_points)
+            continue
+        unset_points = _codepoints(if_unset)
+        assert len(set_points) == len(unset_points)
+        present = (cells.T & direction).astype(bool)[:, :, None]
+        columns.append(numpy.where(present, set_points, unset_points))
+
+    shape = next(c.shape for c in columns if c.ndim == 3)
+    columns = [numpy.broadcast_to(c, shape[:2] + c.shape[-1:]) for c in columns]
+    return numpy.concatenate(columns, axis=2).reshape(shape[0], -1)
@@ -0,0 +1,330 @@
+"""
+Compact binary format for storing mazes.
+
+A maze record is a header followed by the maze's cells, packed to as few
+bits per cell as its wall bits need (4 for rect, 6 for hex), or stored as
+whole bytes if written with `pack=False`.
+
+Record header, little endian:
+
+    magic        4s   b"MAZE"
+    version      H
+    maze type    8s   Name from `mazelib.maze_types`, NUL padded
+    bits         B    Bits per cell: 4, 6 or 8
+    flags        B    FLAG_* bits
+    width        I
+    height       I
+    entrance     qB   Cell index and direction, -1 and 0 if unknown
+    exit         qB   Cell index and direction, -1 and 0 if unknown
+    seed         16s  Unsigned, only valid if FLAG_SEED is set
+
+A maze file holds any number of records, with an index of their offsets at
+the end so any record can be read without reading the others:
+
+    magic        4s   b"MAZF"
+    version      H
+    count        Q    Number of mazes
+    index offset Q    Offset of the index: `count` Q record offsets
+
+Reading a file memory-maps it, so opening is instant whatever its size and
+only the records that are used get read. Mazes stored with `pack=False`
+are read-only views of the mapped file, without any copying.
+
+Cells are normally stored in cell index order (see `Maze.cell_index()`).
+Records written a row at a time by MazeRowWriter set FLAG_ROW_MAJOR and
+store them row by row instead.
+"""
+
+import mmap
+import struct
+
+import numpy
+
+import mazelib
+
+VERSION = 1
+
+RECORD_HEADER = struct.Struct("<4sH8sBBIIqBqB16s")
+RECORD_MAGIC = b"MAZE"
+FILE_HEADER = struct.Struct("<4sHQQ")
+FILE_MAGIC = b"MAZF"
+
+FLAG_SEED = 1
+FLAG_ROW_MAJOR = 2
+
+
+########## Records ##########
+
+def cell_bits(maze_cls):
+    return maze_cls.ALL_WALLS.bit_length()
+
+def encode(maze, seed=None, pack=True):
+    """
+    Returns `maze` as a record, as bytes. `seed` defaults to the maze's
+    `seed` attribute, and isn't stored if None.
+    """
+    if seed is None:
+        seed = maze.seed
+    bits = cell_bits(type(maze)) if pack else 8
+    entrance = maze.entrance or (-1, 0)
+    exit = maze.exit or (-1, 0)
+    header = RECORD_HEADER.pack(
+        RECORD_MAGIC, VERSION, maze.name.encode("ascii"), bits,
+        FLAG_SEED if seed is not None else 0,
+        maze.width, maze.height,
+        entrance[0], entrance[1], exit[0], exit[1],
+        (seed or 0).to_bytes(16, "little"),
+    )
+    return header + pack_cells(maze._flat, bits).tobytes()
+
+def decode(buffer, offset=0):
+    """
+    Reads the record at `offset` in `buffer` and returns it as a maze, with
+    the stored seed (or None) as its `seed` attribute.
+
+    Unpacked records are a read-only view of `buffer`, so `buffer` has to be
+    kept open as long as the maze is used.
+    """
+    header = RECORD_HEADER.unpack_from(buffer, offset)
+    (magic, version, name, bits, flags, width, height,
+        enter_cell, enter_dir, exit_cell, exit_dir, seed) = header
+    if magic != RECORD_MAGIC:
+        raise ValueError("Not a maze record")
+    if version != VERSION:
+        raise ValueError("Unsupported maze record version: {}".format(version))
+
+    maze_cls = mazelib.maze_types[name.rstrip(b"\0").decode("ascii")]
+    n_cells = width * height
+    data = numpy.frombuffer(
+        buffer, dtype=numpy.uint8, count=packed_size(n_cells, bits),
+        offset=offset + RECORD_HEADER.size
+    )
+    cells = unpack_cells(data, n_cells, bits)
+    if flags & FLAG_ROW_MAJOR:
+        cells = numpy.ascontiguousarray(cells.reshape(height, width).T)
+    else:
+        cells = cells.reshape(width, height)
+
+    maze = maze_cls(width, height, cells=cells)
+    if enter_cell >= 0:
+        maze.entrance = (enter_cell, enter_dir)
+    if exit_cell >= 0:
+        maze.exit = (exit_cell, exit_dir)
+    maze.seed = int.from_bytes(seed, "little") if flags & FLAG_SEED else None
+    return maze
+
+
+########## Packing ##########
+
+def packed_size(n_cells, bits):
+    if bits == 8:
+        return n_cells
+    elif bits == 4:
+        return (n_cells + 1) // 2
+    elif bits == 6:
+        return (n_cells + 3) // 4 * 3
+    raise ValueError("Unsupported bits per cell: {}".format(bits))
+
+def pack_cells(flat, bits):
+    """
+    Packs a flat array of cells to `bits` bits per cell. 4 bit cells are
+    packed two to a byte, low nibble first. 6 bit cells are packed four to
+    three bytes, as a little endian 24 bit integer with the first cell in the
+    lowest bits.
+    """
+    if bits == 8:
+        return flat
+    elif bits == 4:
+        padded = numpy.zeros(packed_size(flat.size, 4) * 2, dtype=numpy.uint8)
+        padded[:flat.size] = flat
+        return padded[0::2] | padded[1::2] << 4
+    elif bits == 6:
+        padded = numpy.zeros(packed_size(flat.size, 6) // 3 * 4, dtype="<u4")
+        padded[:flat.size] = flat
+        groups = padded.reshape(-1, 4)
+        words = groups[:, 0] | groups[:, 1] << 6 | groups[:, 2] << 12 | groups[:, 3] << 18
+        return words.view(numpy.uint8).reshape(-1, 4)[:, :3].reshape(-1)
+    raise ValueError("Unsupported bits per cell: {}".format(bits))
+
+def unpack_cells(data, n_cells, bits):
+    """
+    Inverse of pack_cells(). For 8 bits per cell, `data` itself is returned.
+    """
+    if bits == 8:
+        return data
+    elif bits == 4:
+        cells = numpy.empty(data.size * 2, dtype=numpy.uint8)
+        cells[0::2] = data & 0xf
+        cells[1::2] = data >> 4
+        return cells[:n_cells]
+    elif bits == 6:
+        words = numpy.zeros((data.size // 3, 4), dtype=numpy.uint8)
+        words[:, :3] = data.reshape(-1, 3)
+        words = words.view("<u4").reshape(-1, 1)
+        cells = (words >> numpy.array([0, 6, 12, 18], dtype="<u4")) & 0x3f
+        return cells.astype(numpy.uint8).reshape(-1)[:n_cells]
+    raise ValueError("Unsupported bits per cell: {}".format(bits))
+
+
+class MazeRowWriter():
+    """
+    Writes one maze record to the file object `f` a row at a time, as rows
+    are generated, for example by `generate.Eller.iter_rows()`. Each row is
+    an array of cells like `_cells[:, y]`, and is written out as soon as it
+    is given, so memory stays proportional to the width.
+
+    If the file is seekable, the header is rewritten by close() with the
+    actual height and the openings found in the first and last rows, so the
+    height doesn't need to be known in advance.
+    """
+
+    def __init__(self, f, maze_type, width, height=None, seed=None, pack=True):
+        self.f = f
+        self.maze_cls = mazelib.maze_types[maze_type]
+        self.width = width
+        self.height = 0
+        self.seed = seed
+        self.bits = cell_bits(self.maze_cls) if pack else 8
+        self.per_group = {4: 2, 6: 4, 8: 1}[self.bits]  # Cells per whole bytes
+        self.pending = numpy.empty(0, dtype=numpy.uint8)
+        self.first_row = None
+        self.last_row = None
+
+        self.start = f.tell() if f.seekable() else None
+        f.write(self._header(height or 0))
+
+    def _header(self, height, entrance=(-1, 0), exit=(-1, 0)):
+        flags = FLAG_ROW_MAJOR
+        if self.seed is not None:
+            flags |= FLAG_SEED
+        return RECORD_HEADER.pack(
+            RECORD_MAGIC, VERSION, self.maze_cls.name.encode("ascii"),
+            self.bits, flags, self.width, height,
+            entrance[0], entrance[1], exit[0], exit[1],
+            (self.seed or 0).to_bytes(16, "little"),
+        )
+
+    def write_row(self, row):
+        assert len(row) == self.width
+        if self.first_row is None:
+            self.first_row = row.copy()
+        self.last_row = row
+        self.height += 1
+
+        # Only whole bytes can be written, so hold back any cells left over.
+        cells = numpy.concatenate((self.pending, row))
+        split = len(cells) - len(cells) % self.per_group
+        self.f.write(pack_cells(cells[:split], self.bits).tobytes())
+        self.pending = cells[split:]
+
+    def close(self):
+        self.f.write(pack_cells(self.pending, self.bits).tobytes())
+        self.pending = self.pending[:0]
+        if self.start is None or self.height == 0:
+            return
+
+        # Openings in the outside wall on the enter and exit sides
+        maze_cls, height = self.maze_cls, self.height
+        enter_side, exit_side = maze_cls.default_enter_side, maze_cls.default_exit_side
+        openings = []
+        for y, row, side in ((0, self.first_row, enter_side),
+                             (height-1, self.last_row, exit_side)):
+            xs = numpy.flatnonzero((row & side) == 0)
+            openings.append((int(xs[0])*height + y, side) if len(xs) else (-1, 0))
+
+        end = self.f.tell()
+        self.f.seek(self.start)
+        self.f.write(self._header(height, *openings))
+        self.f.seek(end)
+
+
+########## Files ##########
+
+def write(path, mazes, seeds=None, pack=True):
+    """
+    Writes `mazes` to a maze file at `path`. `seeds`, if given, is a seed for
+    each maze.
+    """
+    with MazeFileWriter(path) as writer:
+        if seeds is None:
+            for maze in mazes:
+                writer.add(maze, pack=pack)
+        else:
+            for maze, seed in zip(mazes, seeds):
+                writer.add(maze, seed, pack)
+
+
+class MazeFileWriter():
+    """
+    Writes mazes to a maze file one at a time, so they don't all have to be
+    in memory at once.
+    """
+
+    def __init__(self, path):
+        self.f = open(path, "wb")
+        self.offsets = []
+        self.f.write(FILE_HEADER.pack(FILE_MAGIC, VERSION, 0, 0))
+
+    def add(self, maze, seed=None, pack=True):
+        self.offsets.append(self.f.tell())
+        self.f.write(encode(maze, seed, pack))
+
+    def close(self):
+        if self.f.closed:
+            return
+        index_offset = self.f.tell()
+        self.f.write(numpy.array(self.offsets, dtype="<u8").tobytes())
+        self.f.seek(0)
+        self.f.write(FILE_HEADER.pack(
+            FILE_MAGIC, VERSION, len(self.offsets), index_offset
+        ))
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class MazeFile():
+    """
+    A memory-mapped maze file. Index it to get mazes:
+
+        >>> f = MazeFile("mazes.bin")
+        >>> maze = f[1234]
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, index_offset = FILE_HEADER.unpack_from(self.mmap)
+        if magic != FILE_MAGIC:
+            raise ValueError("Not a maze file: {}".format(path))
+        if version != VERSION:
+            raise ValueError("Unsupported maze file version: {}".format(version))
+        self.offsets = numpy.frombuffer(
+            self.mmap, dtype="<u8", count=count, offset=index_offset
+        )
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        return decode(self.mmap, int(self.offsets[i]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        # Views of the map must be released before it can be closed.
+        self.offsets = None
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,255 @@
+"""
+A pool of generated mazes, for serving mazes without generating them on the
+request path.
+
+    >>> pool = MazePool(max_bytes=64 << 20)
+    >>> pool.set_stock("rect", "kruskal", 100, 100, 50)
+    >>> maze = pool.get("rect", "kruskal", 100, 100)           # From the stock
+    >>> maze = pool.get("rect", "kruskal", 100, 100, seed=42)  # Cached
+
+Mazes asked for with a seed are generated the first time and then kept in an
+LRU cache holding at most `max_bytes` of cells, so popular seeds are only
+generated once. They are the same mazes `generate_many()` gives for the seed.
+
+Mazes asked for without a seed are fresh ones, taken from a stock kept for
+each (maze type, generator, width, height) with set_stock(). Worker
+processes refill the stock in the background as it is used up, and a maze is
+only generated on the request path if the stock has run out.
+
+Mazes are returned with read-only views of the pool's cells, so the cached
+ones can be shared between callers without copying. Copy a maze's `_cells`
+to get one that can be changed.
+"""
+
+import os
+import time
+import threading
+import collections
+import concurrent.futures
+
+import numpy
+
+import mazelib
+from mazelib.batch import maze_rng
+from mazelib.cache import ByteLRU
+
+
+class MazePool():
+    """
+    Cache and stock of generated mazes (see the module docstring). It is
+    safe to use from several threads. `workers` is the number of processes
+    refilling stock, by default the number of CPUs. With 0, stock is refilled
+    by a single background thread instead.
+
+    metrics() returns counts of how well the pool is doing.
+    """
+
+    def __init__(self, max_bytes=256 << 20, workers=None):
+        self.max_bytes = max_bytes
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.executor = None  # Started by the first refill
+        self.lock = threading.Lock()
+
+        # Seeded mazes, by (maze type, generator, width, height, seed), as
+        # (cells, entrance, exit).
+        self.cache = ByteLRU(max_bytes, size=lambda entry: entry[0].nbytes)
+
+        # Unseeded mazes, by (maze type, generator, width, height)
+        self.stock = collections.defaultdict(collections.deque)
+        self.stock_size = {}  # Number to keep
+        self.pending = collections.Counter()  # Number being generated
+        self.wanted = collections.defaultdict(collections.deque)  # Times taken
+
+        self.stock_hits = self.stock_misses = 0
+        self.refilled = 0
+        self.refill_errors = 0
+        self.refill_lag_total = 0
+        self.refill_lag_max = 0
+
+    def get(self, maze_type, generator, width, height, seed=None):
+        """
+        Returns a maze of type `maze_type` generated by `generator`, the one
+        for `seed`, or a fresh one from the stock if `seed` is None.
+        """
+        shape = (maze_type, generator, width, height)
+        if seed is None:
+            return self._get_stocked(shape)
+
+        key = shape + (seed,)
+        entry = self.cache.get(key)
+        if entry is None:
+            # Another thread may generate the same maze meanwhile, in which
+            # case the cache keeps the first.
+            entry = self.cache.put(key, _generate(*shape, seed, 0, 1)[0])
+
+        maze = _make_maze(shape, entry)
+        maze.seed = seed
+        return maze
+
+    def set_stock(self, maze_type, generator, width, height, count):
+        """
+        Keeps `count` fresh mazes of this kind in stock for get() calls
+        without a seed, starting to generate them now.
+        """
+        shape = (maze_type, generator, width, height)
+        with self.lock:
+            self.stock_size[shape] = count
+            deficit = count - len(self.stock[shape]) - self.pending[shape]
+            now = time.monotonic()
+            self.wanted[shape].extend([now] * max(deficit, 0))
+            refills = self._refill(shape)
+        self._watch(shape, refills)
+
+    def metrics(self):
+        """
+        Returns a dict of:
+
+            hits, misses               get() calls with a seed that were
+                                       and weren't in the cache
+            stock_hits, stock_misses   get() calls without a seed that were
+                                       and weren't served from the stock
+            hit_rate                   Fraction of all get() calls served
+                                       without generating, or None
+            evictions                  Mazes evicted from the cache
+            cached_mazes, cached_bytes What the cache holds
+            stocked_mazes              What the stock holds
+            pending                    Stock mazes being generated
+            refilled, refill_errors    Stock mazes generated, and failed
+                                       refills
+            refill_lag_mean,           Seconds from a stock maze being
+            refill_lag_max             taken to its replacement being ready
+        """
+        cache = self.cache
+        with self.lock, cache.lock:
+            served = cache.hits + self.stock_hits
+            calls = served + cache.misses + self.stock_misses
+            return {
+                "hits": cache.hits,
+                "misses": cache.misses,
+                "stock_hits": self.stock_hits,
+                "stock_misses": self.stock_misses,
+                "hit_rate": served / calls if calls else None,
+                "evictions": cache.evictions,
+                "cached_mazes": len(cache),
+                "cached_bytes": cache.nbytes,
+                "stocked_mazes": sum(len(s) for s in self.stock.values()),
+                "pending": sum(self.pending.values()),
+                "refilled": self.refilled,
+                "refill_errors": self.refill_errors,
+                "refill_lag_mean": (self.refill_lag_total / self.refilled
+                                    if self.refilled else None),
+                "refill_lag_max": self.refill_lag_max,
+            }
+
+    def close(self):
+        """Stops refilling, dropping any refills that haven't started."""
+        with self.lock:
+            executor, self.executor = self.executor, None
+            self.stock_size.clear()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    ########## Stock ##########
+
+    def _get_stocked(self, shape):
+        refills = []
+        with self.lock:
+            stock = self.stock[shape]
+            entry = stock.popleft() if stock else None
+            if entry is not None:
+                self.stock_hits += 1
+            else:
+                self.stock_misses += 1
+            if shape in self.stock_size:
+                self.wanted[shape].append(time.monotonic())
+                refills = self._refill(shape)
+        self._watch(shape, refills)
+
+        if entry is None:
+            seed = numpy.random.SeedSequence().entropy
+            entry = _generate(*shape, seed, 0, 1)[0]
+        return _make_maze(shape, entry)
+
+    def _refill(self, shape):
+        """
+        Starts generating enough mazes to bring the stock of `shape` back up
+        to its size, in one chunk per worker. Call with the lock held, then
+        pass the returned list of `(count, future)` to _watch() once it is
+        released.
+        """
+        deficit = self.stock_size.get(shape, 0) - len(self.stock[shape]) \
+                - self.pending[shape]
+        if deficit <= 0:
+            return []
+        if self.executor is None:
+            if self.workers:
+                self.executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+            else:
+                self.executor = concurrent.futures.ThreadPoolExecutor(1)
+
+        refills = []
+        chunk_size = -(-deficit // max(self.workers, 1))
+        for start in range(0, deficit, chunk_size):
+            count = min(chunk_size, deficit - start)
+            seed = numpy.random.SeedSequence().entropy
+            future = self.executor.submit(_generate, *shape, seed, 0, count)
+            self.pending[shape] += count
+            refills.append((count, future))
+        return refills
+
+    def _watch(self, shape, refills):
+        """
+        Stocks the mazes of refills from _refill() as they finish. Call
+        without the lock, since a finished future runs its callback at once.
+        """
+        for count, future in refills:
+            future.add_done_callback(
+                lambda future, count=count: self._stocked(shape, count, future)
+            )
+
+    def _stocked(self, shape, count, future):
+        """Adds a finished refill of `count` mazes to the stock."""
+        with self.lock:
+            self.pending[shape] -= count
+            if future.cancelled() or future.exception() is not None:
+                self.refill_errors += not future.cancelled()
+                return
+            now = time.monotonic()
+            wanted = self.wanted[shape]
+            for entry in future.result():
+                self.stock[shape].append(entry)
+                lag = now - wanted.popleft() if wanted else 0
+                self.refilled += 1
+                self.refill_lag_total += lag
+                self.refill_lag_max = max(self.refill_lag_max, lag)
+
+
+def _generate(maze_type, generator, width, height, seed, start, count):
+    """
+    Generates mazes `start` to `start+count` of `seed`, as for
+    `generate_many()`, returning a list of `(cells, entrance, exit)`.
+    """
+    maze_cls = mazelib.maze_types[maze_type]
+    gen_cls = mazelib.generators[generator]
+    entries = []
+    for i in range(start, start+count):
+        m = maze_cls(width, height)
+        gen_cls(m, rng=maze_rng(seed, i)).generate()
+        entries.append((m._cells, m.entrance, m.exit))
+    return entries
+
+def _make_maze(shape, entry):
+    maze_type, generator, width, height = shape
+    cells, entrance, exit = entry
+    # Done here rather than in _generate(), since the flag doesn't survive
+    # pickling from a worker process.
+    cells.flags.writeable = False
+    maze = mazelib.maze_types[maze_type](width, height, cells=cells.view())
+    maze.entrance, maze.exit = entrance, exit
+    return maze
@@ -0,0 +1,118 @@
+"""
+Animating a maze in a terminal as it is generated.
+
+Rather than printing the whole maze for every frame, only the characters
+that changed since the last frame are written, each run of them after an
+escape sequence that moves the cursor there. Only the lines showing cells
+that changed are rendered to find them.
+"""
+
+import sys
+import time
+
+import numpy
+
+from mazelib.maze import _codepoints
+
+# ANSI escape sequences. Rows and columns are numbered from 1.
+CLEAR = "\x1b[2J\x1b[H"
+MOVE_TO = "\x1b[{};{}H"
+
+# Unchanged characters between two changed ones are rewritten rather than
+# skipped if there are at most this many, since moving the cursor past them
+# takes about as many bytes.
+SKIP_GAP = 8
+
+
+class ProgressRenderer():
+    """
+    Draws a maze on the terminal `out` (stdout by default) and keeps it up to
+    date as it changes. Pass update() the cells each step changed, as
+    `MazeGen.iter_changes()` gives them. The screen is repainted at most
+    `fps` times a second, however fast the steps come, or after every step
+    if `fps` is 0.
+
+        >>> renderer = ProgressRenderer(maze)
+        >>> renderer.start()
+        >>> for changed in gen.iter_changes():
+        ...     renderer.update(changed)
+        >>> renderer.finish()
+    """
+
+    def __init__(self, maze, out=None, fps=30):
+        self.m = maze
+        self.out = sys.stdout if out is None else out
+        self.interval = 1 / fps if fps else 0
+        self.lines = None  # Lines currently on screen
+        self.dirty = numpy.zeros(maze.height, dtype=bool)  # Rows to repaint
+        self.last_frame = 0
+
+    def start(self):
+        self.lines = self.m.str_lines()
+        self.out.write(CLEAR + "\n".join(self.lines))
+        self.out.flush()
+        self.last_frame = time.monotonic()
+
+    def update(self, changed):
+        if len(changed):
+            self.dirty[numpy.asarray(changed) % self.m.height] = True
+        now = time.monotonic()
+        if now - self.last_frame >= self.interval:
+            self.repaint()
+            self.last_frame = now
+
+    def repaint(self):
+        rows = numpy.flatnonzero(self.dirty).tolist()
+        self.dirty[:] = False
+
+        parts = []
+        for start, stop in self._line_spans(rows):
+            for k, line in enumerate(self.m.str_lines(start, stop), start):
+                if line != self.lines[k]:
+                    parts.extend(_diff_line(k, self.lines[k], line))
+                    self.lines[k] = line
+
+        if parts:
+            self.out.write("".join(parts))
+            self.out.flush()
+
+    def finish(self):
+        """Repaints any pending changes and leaves the cursor below the maze."""
+        self.repaint()
+        self.out.write(MOVE_TO.format(len(self.lines)+1, 1))
+        self.out.flush()
+
+    def _line_spans(self, rows):
+        """
+        Merges the lines showing each of `rows` (sorted) into a list of
+        `(start, stop)` line ranges.
+        """
+        spans = []
+        for y in rows:
+            start, stop = self.m.str_line_range(y)
+            if spans and start <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], stop)
+            else:
+                spans.append([start, stop])
+        return spans
+
+
+def _diff_line(k, old, new):
+    """
+    Returns the escape sequences and text that turn line `k` on screen from
+    `old` into `new`.
+    """
+    width = max(len(old), len(new))
+    old, new = old.ljust(width), new.ljust(width)  # Spaces erase leftovers
+    changed = numpy.flatnonzero(_codepoints(old) != _codepoints(new))
+    if not len(changed):
+        return []
+
+    # Split into runs wherever the gap between changes is too long to rewrite.
+    gaps = numpy.flatnonzero(numpy.diff(changed) > SKIP_GAP)
+    starts = [int(changed[0])] + changed[gaps+1].tolist()
+    stops = changed[gaps].tolist() + [int(changed[-1])]
+    return [
+        MOVE_TO.format(k+1, start+1) + new[start:stop+1]
+        for start, stop in zip(starts, stops)
+    ]
@@ -0,0 +1,338 @@
+"""
+Maze solving.
+
+Cells are given as flat cell indexes (see `Maze.cell_index()`). Searches
+are breadth first, expanding the whole frontier at once with array
+operations on the maze's wall bits, so they work on any maze type without
+visiting Cell objects one at a time.
+
+A breadth first search takes a round of array operations per step of
+distance, which is slow for mazes with long paths. When the passages form
+a tree reaching every cell, as in perfect mazes, the same distances are
+found by walking around the tree instead (its Euler tour), in segments
+that are all walked at once.
+"""
+
+import functools
+import math
+
+import numpy
+
+# Number of set bits in each byte value
+POPCOUNT = numpy.array([bin(i).count("1") for i in range(256)], dtype=numpy.uint8)
+
+# Frontiers up to this size are expanded cell by cell rather than with array
+# operations.
+SMALL_FRONTIER = 16
+
+# Mazes with fewer cells are searched breadth first even if they are trees,
+# since walking the tour has more fixed costs.
+TREE_SEARCH_CELLS = 1 << 13
+
+# Euler tours are walked in segments, from a sample of about 1 in
+# sqrt(cells / RULER_SPACING) cells to the next. Sparser samples take more
+# rounds of array operations, denser ones more work to join the segments.
+RULER_SPACING = 256
+
+# Walkers that have finished their segment are only dropped once they are 1
+# in this many of the walkers, since dropping them takes a pass over all.
+DROP_FINISHED = 8
+
+
+def open_neighbors(maze):
+    """
+    Returns an array of the cells reachable in one step from each cell,
+    indexed by [cell index, direction bit number], with -1 where there is a
+    wall or no neighbor.
+    """
+    directions = numpy.array(maze.DIRECTIONS, dtype=numpy.uint8)
+    walls = (maze._flat[:, None] & directions) != 0
+    return numpy.where(walls, -1, maze._neighbors)
+
+def search_neighbors(neighbors, starts, end=None):
+    """
+    Breadth first search over `neighbors`, a table like the one
+    open_neighbors() returns, from all the cells in `starts` at once, and
+    stopping early once `end` is reached. Returns flat arrays of the
+    distance to each cell from the nearest start (-1 if not reached) and the
+    cell each one was reached from (-1 for the starts).
+    """
+    n_cells, n_directions = neighbors.shape
+    # Distances have an extra cell on the end that counts as reached, so
+    # that looking up the -1 of a wall finds it without masking walls out.
+    padded_dist = numpy.full(n_cells+1, -1, dtype=numpy.int64)
+    padded_dist[-1] = 0
+    dist = padded_dist[:-1]
+    parents = numpy.full(n_cells, -1, dtype=numpy.intp)
+    order = numpy.empty(n_cells, dtype=numpy.intp)  # Scratch for deduplicating
+
+    # Memoryviews index single elements much faster than arrays do.
+    flat_neighbors = memoryview(neighbors.reshape(-1))
+    dist_view = memoryview(dist)
+    parents_view = memoryview(parents)
+
+    frontier = numpy.asarray(starts, dtype=numpy.intp).reshape(-1)
+    dist[frontier] = 0
+    frontier = frontier.tolist()
+    distance = 0
+    while len(frontier) and (end is None or dist_view[end] < 0):
+        distance += 1
+
+        # Array operations have a fixed cost per call, which dominates when
+        # the frontier is only a few cells, such as along corridors. Expand
+        # small frontiers one cell at a time instead.
+        if len(frontier) <= SMALL_FRONTIER:
+            next_frontier = []
+            for cell in frontier:
+                i = cell * n_directions
+                for other in flat_neighbors[i:i+n_directions].tolist():
+                    if other >= 0 and dist_view[other] < 0:
+                        dist_view[other] = distance
+                        parents_view[other] = cell
+                        next_frontier.append(other)
+            frontier = next_frontier
+            continue
+
+        frontier = numpy.asarray(frontier, dtype=numpy.intp)
+        reached = neighbors[frontier]
+        rows, columns = numpy.nonzero(padded_dist[reached] < 0)
+        reached = reached[rows, columns]
+        sources = frontier[rows]
+
+        # A cell can be reached from more than one frontier cell if the maze
+        # has loops. Keep one of each.
+        order[reached] = numpy.arange(reached.size)
+        first = order[reached] == numpy.arange(reached.size)
+        frontier = reached[first]
+
+        dist[frontier] = distance
+        parents[frontier] = sources[first]
+        if frontier.size <= SMALL_FRONTIER:
+            frontier = frontier.tolist()
+
+    return dist, parents
+
+def distances(maze, start):
+    """
+    Returns the number of steps from cell `start` to every cell, indexed
+    [x, y] like the maze's cells, with -1 for unreachable cells.
+    """
+    dist, parents = _search(maze, start)
+    return dist.reshape(maze._cells.shape)
+
+def farthest(maze, start):
+    """
+    Returns `(cell index, distance)` of a cell as far as possible from
+    `start`.
+    """
+    dist, parents = _search(maze, start)
+    cell = int(numpy.argmax(dist))
+    return cell, int(dist[cell])
+
+def shortest_path(maze, start, end):
+    """
+    Returns the cell indexes along a shortest path from `start` to `end`,
+    including both, or None if there isn't one.
+    """
+    dist, parents = _search(maze, start, end)
+    if dist[end] < 0:
+        return None
+
+    path = numpy.empty(dist[end]+1, dtype=numpy.intp)
+    path_view, parents_view = memoryview(path), memoryview(parents)
+    cell = int(end)
+    for i in range(len(path)-1, -1, -1):
+        path_view[i] = cell
+        cell = parents_view[cell]
+    return path
+
+def solve(maze):
+    """
+    Returns the shortest path from the maze's entrance to its exit, as cell
+    indexes.
+    """
+    if maze.entrance is None or maze.exit is None:
+        raise ValueError("Maze has no entrance or exit")
+    return shortest_path(maze, maze.entrance[0], maze.exit[0])
+
+def _search(maze, start, end=None):
+    """
+    Searches the maze from `start`, stopping early once `end` is reached.
+    Returns the same as search_neighbors().
+    """
+    if maze.cell_count() >= TREE_SEARCH_CELLS:
+        found = _tree_search(maze, start)
+        if found is not None:
+            return found
+
+    return search_neighbors(open_neighbors(maze), [start], end)
+
+def _tree_search(maze, start):
+    """
+    Returns the same as _search(maze, start), from the maze's Euler tour, if
+    its passages form a tree reaching every cell. Returns None otherwise.
+    """
+    n_cells = maze.cell_count()
+    links = ~maze._flat & maze._interior_walls
+    n_links = POPCOUNT[links].sum(dtype=numpy.int64)
+    if n_cells < 2 or not links.all() or n_links != 2*(n_cells-1):
+        return None
+    rows, offsets = maze._neighbor_offsets()
+    directions = maze.DIRECTIONS
+    opposite = [directions.index(maze.OPPOSITE_DIR[d]) for d in directions]
+    if not _is_consistent(links, rows, offsets, opposite):
+        return None
+    tour = _euler_tour(type(maze), links, rows, offsets, start)
+    if tour is None:
+        return None
+
+    # Each step of the tour goes a cell down or up the tree, and it leaves
+    # each cell for the last time towards its parent, having been down every
+    # other way by then.
+    leaving, arriving = tour[:-1], tour[1:]
+    parents = numpy.empty(n_cells, dtype=tour.dtype)
+    parents[leaving] = arriving  # The last value assigned to an index sticks
+    parents[start] = -1
+    steps = (arriving == parents[leaving]).view(numpy.int8)
+    steps *= -2
+    steps += 1
+    dist = numpy.empty(n_cells, dtype=tour.dtype)
+    dist[arriving] = numpy.cumsum(steps, dtype=tour.dtype)
+    return dist.astype(numpy.int64), parents.astype(numpy.intp)
+
+def _is_consistent(links, rows, offsets, opposite):
+    """
+    Whether every passage in `links`, the open interior walls of each cell,
+    is open from both sides. See `Maze._neighbor_offsets()` for `rows` and
+    `offsets`, and `opposite` is the opposite of each direction bit number.
+    """
+    n_cells = links.size
+    for row, row_offsets in enumerate(offsets.tolist()):
+        for k, offset in enumerate(row_offsets):
+            if opposite[k] < k:
+                continue  # Already compared from the other side
+            start, stop = max(0, -offset), n_cells - max(0, offset)
+            there = links[start+offset:stop+offset]
+            mismatch = (links[start:stop] >> k ^ there >> opposite[k]) & 1
+            if len(offsets) > 1:
+                mismatch &= rows[start:stop] == row
+            if mismatch.any():
+                return False
+    return True
+
+def _euler_tour(maze_cls, links, rows, offsets, start):
+    """
+    Returns the cells the Euler tour of the tree of passages `links` leaves
+    from, in order, starting from and ending with `start`. Returns None if
+    the tree doesn't reach every cell.
+    """
+    n_cells = links.size
+    n_arcs = 2*(n_cells-1)
+    n_directions = len(maze_cls.DIRECTIONS)
+    index_type = numpy.int32 if 2*(n_arcs+1) < 2**31 else numpy.intp
+    turn, slot_bits, row_bits = _turn_table(maze_cls, len(offsets))
+    arc_bits = slot_bits + row_bits
+    ruler_key = 1 << (n_directions + row_bits + arc_bits)
+    arc_offsets = numpy.zeros(1 << arc_bits, dtype=index_type)
+    for row, row_offsets in enumerate(offsets):
+        arc_offsets[row << slot_bits:(row << slot_bits) + n_directions] = row_offsets
+
+    # The tour is split into segments at rulers: the start and a sample of
+    # other cells, which the tour doesn't depend on. A walker starts along
+    # each arc out of them.
+    keys = (rows << n_directions | links).astype(numpy.uint16)
+    spacing = max(2, math.isqrt(n_cells // RULER_SPACING))
+    sample = numpy.random.default_rng(0).integers(0, n_cells, n_cells // spacing + 1)
+    cells = numpy.unique(numpy.append(sample, start))
+    keys[cells] |= ruler_key >> arc_bits
+    keys <<= arc_bits
+    bit_numbers = numpy.arange(n_directions, dtype=numpy.uint8)
+    which, slots = numpy.nonzero((links[cells, None] >> bit_numbers) & 1)
+    cell = cells[which].astype(index_type)
+    code = (slots | rows[cell].astype(numpy.intp) << slot_bits).astype(numpy.uint8)
+    rulers = cell.astype(numpy.int64) << arc_bits | code  # Sorted
+
+    # Walk the segments all at once. Walkers that reach the next ruler are
+    # moved to an extra segment, whose steps are thrown away.
+    n_rulers = rulers.size
+    next_ruler = numpy.empty(n_rulers+1, dtype=numpy.intp)
+    length = numpy.empty(n_rulers+1, dtype=numpy.intp)
+    segment = numpy.arange(n_rulers, dtype=index_type)
+    rounds = [(cell, segment)]
+    finished = 0
+    while cell.size:
+        cell = cell + arc_offsets[code]
+        key = keys[cell]
+        reached = key >= ruler_key
+        key |= code
+        code = turn[key]
+        if reached.any():
+            which = numpy.flatnonzero(reached)
+            ended = segment[which]
+            next_ruler[ended] = numpy.searchsorted(
+                rulers, cell[which].astype(numpy.int64) << arc_bits | code[which])
+            length[ended] = len(rounds)
+            finished += numpy.count_nonzero(ended != n_rulers)
+            segment = segment.copy()
+            segment[which] = n_rulers
+            if finished * DROP_FINISHED > segment.size:
+                keep = segment != n_rulers
+                cell, code, segment = cell[keep], code[keep], segment[keep]
+                finished = 0
+        rounds.append((cell, segment))
+
+    # Chain the segments together from the start's first arc.
+    next_ruler, length = next_ruler.tolist(), length.tolist()
+    first = [0] * (n_rulers+1)  # Position in the tour of each segment
+    ruler = first_ruler = int(numpy.searchsorted(rulers, start << arc_bits))
+    position = 0
+    while True:
+        first[ruler] = position
+        position += length[ruler]
+        ruler = next_ruler[ruler]
+        if ruler == first_ruler:
+            break
+    if position != n_arcs:
+        return None
+    first[n_rulers] = n_arcs + 1
+    first = numpy.array(first, dtype=index_type)
+
+    tour = numpy.empty(n_arcs + 1 + len(rounds), dtype=index_type)
+    for step, (cell, segment) in enumerate(rounds):
+        tour[first[segment] + step] = cell
+    tour[n_arcs] = start
+    return tour[:n_arcs+1]
+
+@functools.lru_cache()
+def _turn_table(maze_cls, row_kinds):
+    """
+    Returns `(table, slot_bits, row_bits)` for walking the Euler tours of
+    mazes of type `maze_cls` with `row_kinds` kinds of rows (see
+    `Maze._neighbor_offsets()`).
+
+    An arc, a step out of a cell, is coded as the direction bit number it
+    leaves by, or its slot, | the cell's row kind << slot_bits. Walking
+    into a cell whose key is `links | row kind << D | is a ruler << D +
+    row_bits`, by arc `code`, the tour goes on by arc `table[key <<
+    arc_bits | code]`: the next open direction after the way back, in bit
+    order.
+    """
+    directions = maze_cls.DIRECTIONS
+    n_directions = len(directions)
+    opposite = [directions.index(maze_cls.OPPOSITE_DIR[d]) for d in directions]
+    slot_bits = (n_directions-1).bit_length()
+    row_bits = (row_kinds-1).bit_length()
+    arc_bits = slot_bits + row_bits
+
+    turns = numpy.zeros((1 << n_directions, 1 << slot_bits), dtype=numpy.uint8)
+    for links in range(1, 1 << n_directions):
+        for slot in range(n_directions):
+            ways = [(opposite[slot] + i) % n_directions for i in range(1, n_directions+1)]
+            turns[links, slot] = next(way for way in ways if links >> way & 1)
+
+    keys = numpy.arange(1 << (n_directions + row_bits + 1 + arc_bits))
+    cells, arcs = keys >> arc_bits, keys & ((1 << arc_bits) - 1)
+    links = cells & ((1 << n_directions) - 1)
+    row = cells >> n_directions & ((1 << row_bits) - 1)
+    table = turns[links, arcs & ((1 << slot_bits) - 1)] | row << slot_bits
+    return table.astype(numpy.uint8), slot_bits, row_bits
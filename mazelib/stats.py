@@ -0,0 +1,129 @@
+"""
+Collecting statistics about maze generation.
+
+Pass a GenStats as the `stats` argument of `MazeGen.generate()`,
+`MazeGen.iter_steps()`, `generate_many()` or `generate_tiled()` and it gets
+told how long each phase of generation took, and a few counts. Without one,
+generation runs exactly as it otherwise would, with nothing added to the
+step loop. One GenStats can collect over any number of mazes:
+
+    >>> stats = GenStats()
+    >>> cells = mazelib.generate_many("rect", "kruskal", 30, 30, 1000, stats=stats)
+    >>> print(stats.summary())
+
+The phases are:
+
+    init     MazeGen.init()
+    steps    The step loop, not counting time spent by whoever is iterating
+             over iter_steps()
+    finish   MazeGen.finish()
+
+plus any that callers time themselves with phase(), such as "render".
+"""
+
+import time
+import contextlib
+
+import numpy
+
+
+class GenStats():
+    """
+    Totals over every maze generated with this as their `stats`:
+
+        mazes          Number of mazes generated. Each tile of
+                       generate_tiled() counts as a maze.
+        cells          Number of cells in them
+        phases         Dict of phase name to seconds
+        steps          Number of steps
+        walls_removed  Number of walls removed, less any added, counting a
+                       wall between two cells once
+        peak_frontier  Largest size of a generator's stack or frontier, from
+                       MazeGen.frontier_size(), or None if it hasn't got one.
+                       It is checked after init() and after each batch of
+                       steps, so with batches of more than one step the
+                       peak can be missed.
+    """
+
+    def __init__(self):
+        self.mazes = 0
+        self.cells = 0
+        self.phases = {}
+        self.steps = 0
+        self.walls_removed = 0
+        self.peak_frontier = None
+        self._walls = 0  # Walls of the maze being generated, when it started
+
+    def add_phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0) + seconds
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Adds the time spent in a `with` block to phase `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def add_steps(self, steps):
+        self.steps += steps
+
+    def add_frontier(self, size):
+        if size is not None and (self.peak_frontier is None or
+                                 size > self.peak_frontier):
+            self.peak_frontier = size
+
+    def start_maze(self, maze):
+        self.mazes += 1
+        self.cells += maze.cell_count()
+        self._walls = count_walls(maze)
+
+    def end_maze(self, maze):
+        self.walls_removed += self._walls - count_walls(maze)
+
+    def merge(self, other):
+        """Adds the totals of another GenStats, such as one from a worker."""
+        self.mazes += other.mazes
+        self.cells += other.cells
+        for name, seconds in other.phases.items():
+            self.add_phase(name, seconds)
+        self.add_steps(other.steps)
+        self.add_frontier(other.peak_frontier)
+        self.walls_removed += other.walls_removed
+
+    def summary(self):
+        """Returns the totals as lines of text."""
+        lines = [
+            "{:<16} {:>14}".format("mazes", self.mazes),
+            "{:<16} {:>14}".format("cells", self.cells),
+            "{:<16} {:>14}".format("steps", self.steps),
+            "{:<16} {:>14}".format("walls removed", self.walls_removed),
+            "{:<16} {:>14}".format(
+                "peak frontier",
+                "-" if self.peak_frontier is None else self.peak_frontier
+            ),
+        ]
+        total = sum(self.phases.values())
+        names = [n for n in ("init", "steps", "finish") if n in self.phases]
+        names += [n for n in self.phases if n not in names]
+        for name in names:
+            seconds = self.phases[name]
+            lines.append("{:<16} {:>13.4f}s {:>5.1f}%".format(
+                name, seconds, 100 * seconds / total if total else 0
+            ))
+        lines.append("{:<16} {:>13.4f}s".format("total", total))
+        if self.cells and self.phases.get("steps"):
+            lines.append("{:<16} {:>14.0f}".format(
+                "cells/sec", self.cells / self.phases["steps"]
+            ))
+        return "\n".join(lines)
+
+
+def count_walls(maze):
+    """Number of walls of `maze`, counting a wall between two cells once."""
+    directions = numpy.array(maze.DIRECTIONS, dtype=numpy.uint8)
+    closed = (maze._flat[:, None] & directions) != 0
+    interior = maze._neighbors >= 0
+    return (numpy.count_nonzero(closed & interior) // 2
+            + numpy.count_nonzero(closed & ~interior))
@@ -0,0 +1,132 @@
+"""
+Generating one huge RectMaze in tiles, spread over worker processes.
+
+The maze is split into a grid of tiles, and each tile is generated as a
+maze of its own by a worker, straight into the cells of a maze in shared
+memory. Each tile is a perfect maze, so joining the tiles along a
+spanning tree of the tile grid, with one opening in each border the tree
+crosses, makes the whole maze perfect.
+"""
+
+import os
+import time
+import itertools
+import concurrent.futures
+
+import numpy
+
+import mazelib
+from mazelib.maze import RectMaze
+from mazelib.batch import maze_rng
+from mazelib.stats import GenStats
+
+
+def generate_tiled(generator, width, height, tile_size=1024, seed=None,
+                   workers=None, stats=None):
+    """
+    Generates a `width` by `height` RectMaze with the generator named
+    `generator`, in tiles of up to `tile_size` cells a side. The result only
+    depends on `seed` and `tile_size`, not on `workers`, which is the number
+    of processes to use and defaults to the number of CPUs. With a `seed` of
+    None, a random one is picked.
+
+    If `stats` is a `stats.GenStats`, the statistics of every tile are added
+    to it, as by `MazeGen.generate()`, and the time taken to join them as
+    phase "stitch".
+    """
+    if seed is None:
+        seed = numpy.random.SeedSequence().entropy
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    xs, ys = _split(width, tile_size), _split(height, tile_size)
+    tiles = [
+        (i, xs[tx], xs[tx+1], ys[ty], ys[ty+1])
+        for i, (tx, ty) in enumerate(itertools.product(range(len(xs)-1),
+                                                       range(len(ys)-1)))
+    ]
+
+    if workers <= 1 or len(tiles) <= 1:
+        cells = numpy.empty((width, height), dtype=numpy.uint8)
+        _generate_tiles(cells, generator, seed, tiles, stats)
+    else:
+        shared = RectMaze(width, height, shared=True)
+        try:
+            # A few chunks per worker, so they finish around the same time.
+            chunk_size = max(1, -(-len(tiles) // (workers*4)))
+            with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+                futures = [
+                    executor.submit(_generate_shared_tiles, shared, generator,
+                                    seed, tiles[start:start+chunk_size],
+                                    None if stats is None else GenStats())
+                    for start in range(0, len(tiles), chunk_size)
+                ]
+                for future in futures:
+                    chunk_stats = future.result()
+                    if stats is not None:
+                        stats.merge(chunk_stats)
+            cells = shared._cells.copy()
+        finally:
+            shared.close()
+            shared.shared_memory.unlink()
+
+    maze = RectMaze(width, height, cells=cells)
+    start = time.perf_counter()
+    _stitch(maze, xs, ys, maze_rng(seed, len(tiles)))
+    if stats is not None:
+        stats.add_phase("stitch", time.perf_counter() - start)
+    maze.seed = seed
+    return maze
+
+def _split(length, tile_size):
+    """Tile boundaries splitting `length` into near-equal tiles."""
+    n_tiles = -(-length // tile_size)
+    return [length * i // n_tiles for i in range(n_tiles+1)]
+
+def _generate_tiles(cells, generator, seed, tiles, stats=None):
+    gen_cls = mazelib.generators[generator]
+    for i, x0, x1, y0, y1 in tiles:
+        tile = RectMaze(x1-x0, y1-y0)
+        gen_cls(tile, rng=maze_rng(seed, i)).generate(stats)
+
+        # Close the entrance and exit. Tiles are only joined by _stitch().
+        tile.close_outer_walls()
+        cells[x0:x1, y0:y1] = tile._cells
+
+def _generate_shared_tiles(maze, generator, seed, tiles, stats=None):
+    try:
+        _generate_tiles(maze._cells, generator, seed, tiles, stats)
+    finally:
+        maze.close()
+    return stats
+
+def _stitch(maze, xs, ys, rng):
+    """
+    Joins the tiles split by boundaries `xs` and `ys` along a random
+    spanning tree of the tile grid, and opens the entrance and exit.
+    """
+    N, S, E, W = maze.N, maze.S, maze.E, maze.W
+    cells = maze._cells
+
+    # The spanning tree is a maze with a cell per tile. The walls are cleared
+    # directly, since a neighbor table for the whole maze would be several
+    # times its size.
+    tree = RectMaze(len(xs)-1, len(ys)-1)
+    mazelib.generators["kruskal"](tree, rng=rng).generate()
+    for tx, ty in itertools.product(range(tree.width), range(tree.height)):
+        t = tree.cell_index((tx, ty))
+        if tx+1 < tree.width and not tree.has_wall(t, E):
+            x, y = xs[tx+1]-1, rng.randrange(ys[ty], ys[ty+1])
+            cells[x, y] &= ~E & maze.ALL_WALLS
+            cells[x+1, y] &= ~W & maze.ALL_WALLS
+        if ty+1 < tree.height and not tree.has_wall(t, S):
+            x, y = rng.randrange(xs[tx], xs[tx+1]), ys[ty+1]-1
+            cells[x, y] &= ~S & maze.ALL_WALLS
+            cells[x, y+1] &= ~N & maze.ALL_WALLS
+
+    enter_x = rng.randrange(maze.width)
+    exit_x = rng.randrange(maze.width)
+    cells[enter_x, 0] &= ~N & maze.ALL_WALLS
+    cells[exit_x, -1] &= ~S & maze.ALL_WALLS
+    maze.entrance = (maze.cell_index((enter_x, 0)), N)
+    maze.exit = (maze.cell_index((exit_x, maze.height-1)), S)
@@ -0,0 +1,154 @@
+"""
+An endless RectMaze, generated a chunk at a time as it is explored.
+
+    >>> world = MazeWorld(seed=42)
+    >>> world.cell(-1000000, 35)               # Wall bits of any cell
+    >>> print(world.region(-20, -10, 40, 20).to_str())
+
+The world is split into square chunks, and each chunk is a perfect maze of
+its own, generated from a seed derived from the world's seed and the
+chunk's coordinates. Every border between two chunks has one opening, at a
+cell picked by hashing the world's seed and the border's coordinates, so
+both chunks agree on it without either being generated first. With every
+chunk connected inside and every border open, the whole world is
+connected. It isn't perfect though: there is a loop through the 4 borders
+around each chunk corner.
+
+A chunk only depends on its own coordinates, so any chunk costs the same to
+get, however far it is from the others. Chunks are kept in an LRU cache of
+at most `max_bytes` of cells and regenerated if they are needed again.
+"""
+
+import numpy
+
+import mazelib
+from mazelib.maze import RectMaze
+from mazelib.cache import ByteLRU
+from mazelib.batch import spawn_rng
+
+# Spawn key tags, so chunks and each kind of border get independent streams.
+CHUNK_TAG = 0
+EAST_BORDER_TAG = 1
+SOUTH_BORDER_TAG = 2
+
+
+class MazeWorld():
+    """
+    An endless maze of `chunk_size` by `chunk_size` chunks, each generated
+    with the generator named `generator` (see the module docstring). Cells
+    have global coordinates `(x, y)`, which can be negative, with y going
+    south like in a RectMaze, and are in chunk
+    `(x // chunk_size, y // chunk_size)`.
+
+    The world only depends on `seed`, `chunk_size` and `generator`. With a
+    `seed` of None, a random one is picked.
+    """
+
+    def __init__(self, seed=None, chunk_size=64, generator="backtrack",
+                 max_bytes=64 << 20):
+        supported = mazelib.generators[generator].supported_maze_types
+        if supported is not None and RectMaze.name not in supported:
+            raise ValueError("Generator {} doesn't support rect mazes".format(generator))
+        if seed is None:
+            seed = numpy.random.SeedSequence().entropy
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.generator = generator
+        self.max_bytes = max_bytes
+        self.cache = ByteLRU(max_bytes)  # Chunk cells by (cx, cy)
+
+    def chunk(self, cx, cy):
+        """
+        Returns chunk `(cx, cy)` as a RectMaze. Its cells are a read-only
+        view of the cache's.
+        """
+        size = self.chunk_size
+        return RectMaze(size, size, cells=self._chunk_cells(cx, cy).view())
+
+    def cell(self, x, y):
+        """Returns the wall bits of the cell at `(x, y)`."""
+        cx, x = divmod(x, self.chunk_size)
+        cy, y = divmod(y, self.chunk_size)
+        return int(self._chunk_cells(cx, cy)[x, y])
+
+    def has_wall(self, x, y, direction):
+        return bool(self.cell(x, y) & direction)
+
+    def region(self, x, y, width, height):
+        """
+        Returns a copy of the `width` by `height` cells starting at `(x, y)`
+        as a RectMaze. Its outside wall has openings where passages lead
+        out of the region.
+        """
+        size = self.chunk_size
+        cells = numpy.empty((width, height), dtype=numpy.uint8)
+        for cx in range(x // size, (x+width-1) // size + 1):
+            x0, x1 = max(x, cx*size), min(x+width, (cx+1)*size)
+            for cy in range(y // size, (y+height-1) // size + 1):
+                y0, y1 = max(y, cy*size), min(y+height, (cy+1)*size)
+                chunk = self._chunk_cells(cx, cy)
+                cells[x0-x:x1-x, y0-y:y1-y] = \
+                    chunk[x0-cx*size:x1-cx*size, y0-cy*size:y1-cy*size]
+        return RectMaze(width, height, cells=cells)
+
+    def metrics(self):
+        """
+        Returns a dict of the cache's hits, misses, evictions, cached_chunks,
+        cached_bytes and hit_rate (None before any chunk is asked for).
+        """
+        cache = self.cache
+        calls = cache.hits + cache.misses
+        return {
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "evictions": cache.evictions,
+            "cached_chunks": len(cache),
+            "cached_bytes": cache.nbytes,
+            "hit_rate": cache.hits / calls if calls else None,
+        }
+
+    ########## Chunks ##########
+
+    def _chunk_cells(self, cx, cy):
+        cells = self.cache.get((cx, cy))
+        if cells is None:
+            cells = self.cache.put((cx, cy), self._generate_chunk(cx, cy))
+        return cells
+
+    def _generate_chunk(self, cx, cy):
+        N, S, E, W = RectMaze.N, RectMaze.S, RectMaze.E, RectMaze.W
+        size = self.chunk_size
+        maze = RectMaze(size, size)
+        rng = world_rng(self.seed, CHUNK_TAG, cx, cy)
+        mazelib.generators[self.generator](maze, rng=rng).generate()
+
+        # Close the entrance and exit. Chunks are only joined through one
+        # opening in each border, which the chunk on the other side of it
+        # picks too.
+        maze.close_outer_walls()
+        cells = maze._cells
+        cells[-1, self._opening(EAST_BORDER_TAG, cx, cy)] &= ~E & RectMaze.ALL_WALLS
+        cells[0, self._opening(EAST_BORDER_TAG, cx-1, cy)] &= ~W & RectMaze.ALL_WALLS
+        cells[self._opening(SOUTH_BORDER_TAG, cx, cy), -1] &= ~S & RectMaze.ALL_WALLS
+        cells[self._opening(SOUTH_BORDER_TAG, cx, cy-1), 0] &= ~N & RectMaze.ALL_WALLS
+        cells.flags.writeable = False
+        return cells
+
+    def _opening(self, tag, cx, cy):
+        """
+        Offset along the east or south border of chunk `(cx, cy)`, by `tag`,
+        of the opening in it.
+        """
+        return world_rng(self.seed, tag, cx, cy).randrange(self.chunk_size)
+
+
+def world_rng(seed, tag, cx, cy):
+    """
+    Returns the `random.Random` for the chunk or border `tag` at `(cx, cy)`
+    of the world with `seed`, an independent stream like `maze_rng()`'s.
+    """
+    return spawn_rng(seed, tag, _zigzag(cx), _zigzag(cy))
+
+def _zigzag(n):
+    """Maps integers to distinct non-negative ones, for spawn keys."""
+    return 2*n if n >= 0 else -2*n - 1
@@ -5,15 +5,11 @@ Generates mazes.
 
 import sys
 import argparse
-import subprocess
+import contextlib
 
 import mazelib
 
 
-def get_special_char(capname):
-    # See manpage for "terminfo" for capname values.
-    return subprocess.check_output(["tput", capname]).decode()
-
 def main():
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("width", nargs="?", type=int, default=50,
@@ -26,39 +22,101 @@ def main():
     parser.add_argument("--progress", "-p", default=False, action="store_true",
             help="Prints the maze as it is being generated. "
             "Not all generation algorithms support this")
-    parser.add_argument("--skip", "-s", default=0, type=int,
-            help="When using --progress, skip this many intermediate steps "
-            "before printing again.")
+    parser.add_argument("--fps", default=30, type=float,
+            help="When using --progress, redraw at most this many times a "
+            "second. 0 redraws after every step.")
     parser.add_argument("--grid", "-g", default="rect",
             choices=mazelib.maze_types.keys(),
             help="Maze grid type to use.")
+    parser.add_argument("--count", "-n", default=1, type=int,
+            help="Number of mazes to generate.")
+    parser.add_argument("--seed", default=None, type=int,
+            help="Random seed. The same seed gives the same mazes, whatever "
+            "the number of workers.")
+    parser.add_argument("--workers", "-w", default=1, type=int,
+            help="Number of processes to generate mazes with.")
+    parser.add_argument("--tile-size", "-t", default=None, type=int,
+            help="Generate a single rect maze in tiles of up to this many "
+            "cells a side, spread over the workers.")
+    parser.add_argument("--image", "-i", default=None, metavar="PATH",
+            help="Write the maze to a PNG image instead of printing it.")
+    parser.add_argument("--cell-size", default=8, type=int,
+            help="With --image, the distance in pixels between neighboring "
+            "cells.")
+    parser.add_argument("--stats", default=False, action="store_true",
+            help="Print the time spent in each phase of generation and "
+            "rendering, and other statistics, to stderr when done.")
     args = parser.parse_args()
+    stats = mazelib.stats.GenStats() if args.stats else None
 
     maze_cls = mazelib.maze_types[args.grid]
+    supported = mazelib.generators[args.algorithm].supported_maze_types
+    if supported is not None and args.grid not in supported:
+        parser.error("algorithm {} only supports grids: {}".format(
+            args.algorithm, ", ".join(supported)
+        ))
 
-    if args.progress:
-        clear_chr = get_special_char("clear")
-        lineup_chr = get_special_char("cuu1")  # Moves cursor 1 line up
+    if args.tile_size is not None and (args.grid != "rect" or args.count != 1):
+        parser.error("--tile-size only supports a single rect maze")
+    if args.image is not None and args.count != 1:
+        parser.error("--image only supports a single maze")
+    if args.cell_size < 2:
+        parser.error("--cell-size must be at least 2")
+    if args.progress and (args.count != 1 or args.workers != 1 or args.tile_size is not None):
+        parser.error("--progress only supports a single maze, without --workers "
+                     "or --tile-size")
 
+    if args.progress:
         m = maze_cls(args.width, args.height)
         cls = mazelib.generators[args.algorithm]
-        gen = cls(m)
-        print(clear_chr)
-        for i, m in enumerate(gen.iter_steps()):
-            if i % (args.skip+1) == 0:
-                s = m.to_str()
-                print(lineup_chr*(s.count("\n")+1), end="")
-                print(s)
+        rng = None
+        if args.seed is not None:
+            rng = mazelib.batch.maze_rng(args.seed, 0)
+        gen = cls(m, rng=rng)
 
-        print(clear_chr)
-        print(m.to_str())
+        renderer = mazelib.progress.ProgressRenderer(m, fps=args.fps)
+        with timed(stats, "render"):
+            renderer.start()
+        for changed in gen.iter_changes(stats=stats):
+            with timed(stats, "render"):
+                renderer.update(changed)
+        with timed(stats, "render"):
+            renderer.finish()
+        if args.image is not None:
+            output(m, args, stats)
+
+    elif args.tile_size is not None:
+        m = mazelib.generate_tiled(
+            args.algorithm, args.width, args.height, args.tile_size,
+            seed=args.seed, workers=args.workers, stats=stats
+        )
+        output(m, args, stats)
 
     else:
-        m = maze_cls(args.width, args.height)
-        cls = mazelib.generators[args.algorithm]
-        gen = cls(m)
-        m = gen.generate()
-        print(m.to_str())
+        all_cells = mazelib.generate_many(
+            args.grid, args.algorithm, args.width, args.height, args.count,
+            seed=args.seed, workers=args.workers, stats=stats
+        )
+        for i, cells in enumerate(all_cells):
+            if i > 0:
+                print()
+            m = maze_cls(args.width, args.height, cells=cells)
+            output(m, args, stats)
+
+    if stats is not None:
+        print(stats.summary(), file=sys.stderr)
+
+def output(maze, args, stats):
+    """Prints `maze`, or writes it to the --image file."""
+    with timed(stats, "render"):
+        if args.image is not None:
+            maze.to_img(args.image, args.cell_size)
+        else:
+            maze.write_str(sys.stdout)
+
+def timed(stats, phase):
+    """Times a `with` block as `phase` of `stats`, unless `stats` is None."""
+    return contextlib.nullcontext() if stats is None else stats.phase(phase)
 
 
 if __name__ == "__main__":
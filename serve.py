@@ -0,0 +1,480 @@
+#!/usr/bin/python3
+"""
+Serves mazes over HTTP, as JSON, text or PNG images.
+
+Every endpoint is a GET taking the query parameters `type` (default rect),
+`algorithm` (backtrack), `width` (50), `height` (30) and `seed`:
+
+    /          The maze types and generators, as JSON
+    /generate  The maze as JSON, with the maze itself as a base64 mazefile
+               record (see `mazelib.mazefile.decode()`)
+    /solve     The cells of the shortest path from the entrance to the exit,
+               as JSON
+    /render    The maze as text, or as a PNG image with `format=png` and
+               `cell_size` (8). Renders are sent chunked, as they are
+               rendered.
+    /stats     Request and batch counts, as JSON
+
+The same seed always gives the same maze, the one run.py --seed gives.
+Without one, a random seed is picked and returned with the maze.
+
+Generating and solving run in worker processes, so the server keeps
+answering while they run. Requests for mazes of the same shape that arrive
+within BATCH_DELAY of each other are sent to a worker together, so a busy
+server makes fewer, bigger round trips to its workers. Renders run in a
+thread, a band at a time, handing each chunk to the event loop to send.
+"""
+
+import os
+import sys
+import json
+import base64
+import collections
+import random
+import asyncio
+import argparse
+import urllib.parse
+import concurrent.futures
+
+import mazelib
+from mazelib import mazefile, solve
+from mazelib.batch import maze_rng
+
+# Same-shaped requests arriving within this many seconds of the first are
+# batched together, up to BATCH_SIZE requests or BATCH_CELLS cells.
+BATCH_DELAY = 0.002
+BATCH_SIZE = 64
+BATCH_CELLS = 1 << 20
+
+# Renders are sent in chunks of about this many bytes, with at most
+# RENDER_QUEUE chunks rendered ahead of what has been sent.
+RENDER_CHUNK = 1 << 16
+RENDER_QUEUE = 4
+
+# Largest cell_size of PNG renders, since rendering needs memory for
+# several cell_size squares of pixels, and largest number of pixels, taking
+# each cell as cell_size squared.
+MAX_CELL_SIZE = 64
+MAX_PIXELS = 1 << 32
+
+# Largest seed, since mazefile records store seeds in 16 bytes.
+MAX_SEED = (1 << 128) - 1
+
+# Longest request line or header line accepted.
+MAX_LINE = 1 << 13
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+class MazeServer():
+    """
+    Handles connections for asyncio.start_server(). Heavy work goes to
+    `executor`, normally a ProcessPoolExecutor of `workers` processes. Mazes
+    over `max_cells` cells are refused.
+    """
+
+    def __init__(self, executor, workers, max_cells=1 << 24):
+        self.executor = executor
+        self.max_cells = max_cells
+        self.batcher = Batcher(executor, _run_batch, workers)
+        self.requests = 0
+        self.routes = {
+            "/": self.index,
+            "/generate": self.generate,
+            "/solve": self.solve,
+            "/render": self.render,
+            "/stats": self.stats,
+        }
+
+    async def handle(self, reader, writer):
+        """Serves the requests of a connection until it is closed."""
+        try:
+            keep_alive = True
+            while keep_alive:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, keep_alive = request
+                self.requests += 1
+                await self.respond(writer, method, target, keep_alive)
+        except (ValueError, ConnectionError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, method, target, keep_alive):
+        url = urllib.parse.urlsplit(target)
+        route = self.routes.get(url.path)
+        if route is None:
+            return await _send_json(writer, 404, {"error": "Not found"}, keep_alive)
+        if method != "GET":
+            return await _send_json(writer, 405, {"error": "Only GET is allowed"}, keep_alive)
+
+        try:
+            params = parse_params(url.query, self.max_cells)
+        except ValueError as e:
+            return await _send_json(writer, 400, {"error": str(e)}, keep_alive)
+        try:
+            await route(writer, params, keep_alive)
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            await _send_json(writer, 500, {"error": repr(e)}, keep_alive)
+
+    ########## Endpoints ##########
+
+    async def index(self, writer, params, keep_alive):
+        await _send_json(writer, 200, {
+            "maze_types": list(mazelib.maze_types),
+            "generators": {
+                name: cls.supported_maze_types or list(mazelib.maze_types)
+                for name, cls in mazelib.generators.items()
+            },
+        }, keep_alive)
+
+    async def generate(self, writer, params, keep_alive):
+        record = await self._run("generate", params)
+        result = _describe(params)
+        result["maze"] = base64.b64encode(record).decode("ascii")
+        await _send_json(writer, 200, result, keep_alive)
+
+    async def solve(self, writer, params, keep_alive):
+        path = await self._run("solve", params)
+        result = _describe(params)
+        result["length"] = len(path)
+        result["path"] = path
+        await _send_json(writer, 200, result, keep_alive)
+
+    async def render(self, writer, params, keep_alive):
+        record = await self._run("generate", params)
+        if params["format"] == "png":
+            content_type = "image/png"
+        else:
+            content_type = "text/plain; charset=utf-8"
+        _write_head(writer, 200, content_type, keep_alive, [
+            ("Transfer-Encoding", "chunked"),
+            ("X-Maze-Seed", str(params["seed"])),
+        ])
+
+        loop = asyncio.get_running_loop()
+        out = _ChunkQueue(loop)
+        def render():
+            try:
+                maze = mazefile.decode(record)
+                if params["format"] == "png":
+                    maze.to_img(out, params["cell_size"])
+                else:
+                    maze.write_str(out)
+            finally:
+                out.close()
+        rendered = loop.run_in_executor(None, render)
+
+        try:
+            while True:
+                chunk = await out.queue.get()
+                if chunk is None:
+                    break
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                await writer.drain()
+        except BaseException:
+            # Stop the render, and let it finish so its thread is freed.
+            out.cancelled = True
+            while await out.queue.get() is not None:
+                pass
+            raise
+        try:
+            await rendered
+        except Exception as e:
+            # Too late to report it, so drop the connection instead.
+            raise ConnectionError("Render failed") from e
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def stats(self, writer, params, keep_alive):
+        await _send_json(writer, 200, {
+            "requests": self.requests,
+            "batches": self.batcher.batches,
+            "batched": self.batcher.items,
+        }, keep_alive)
+
+    async def _run(self, kind, params):
+        shape = (params["type"], params["algorithm"], params["width"], params["height"])
+        limit = min(BATCH_SIZE, max(1, BATCH_CELLS // (params["width"]*params["height"])))
+        return await self.batcher.submit((kind,) + shape, params["seed"], limit)
+
+
+class Batcher():
+    """
+    Runs `func(key, items)` in `executor` for batches of the items
+    submitted with the same key, returning each item's result from the list
+    `func` returns.
+
+    A batch is ready BATCH_DELAY after its first item is submitted, or once
+    it is full, and at most `max_running` batches run at once. Until a
+    ready batch gets to run, more items can still join it, so batches grow
+    when the workers are busy.
+    """
+
+    def __init__(self, executor, func, max_running, delay=BATCH_DELAY):
+        self.executor = executor
+        self.func = func
+        self.max_running = max_running
+        self.delay = delay
+        self.filling = {}  # Key to the batch items can join
+        self.waiting = collections.deque()  # Ready batches, oldest first
+        self.running = 0
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, key, item, limit=BATCH_SIZE):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self.filling.get(key)
+        if batch is None:
+            batch = self.filling[key] = _Batch(key)
+            loop.call_later(self.delay, self._ready, batch)
+        batch.items.append((item, future))
+        if len(batch.items) >= limit:
+            del self.filling[key]
+            self._ready(batch)
+        return await future
+
+    def _ready(self, batch):
+        if not batch.ready:
+            batch.ready = True
+            self.waiting.append(batch)
+            self._run_waiting()
+
+    def _run_waiting(self):
+        loop = asyncio.get_running_loop()
+        while self.waiting and self.running < self.max_running:
+            batch = self.waiting.popleft()
+            if self.filling.get(batch.key) is batch:
+                del self.filling[batch.key]
+            self.running += 1
+            self.batches += 1
+            self.items += len(batch.items)
+            done = loop.run_in_executor(self.executor, self.func, batch.key,
+                                        [item for item, future in batch.items])
+            done.add_done_callback(lambda done, batch=batch: self._done(batch, done))
+
+    def _done(self, batch, done):
+        self.running -= 1
+        # Futures of clients that went away are already cancelled.
+        error = done.exception()
+        results = [error] * len(batch.items) if error else done.result()
+        for (item, future), result in zip(batch.items, results):
+            if future.done():
+                pass
+            elif error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        self._run_waiting()
+
+
+class _Batch():
+    def __init__(self, key):
+        self.key = key
+        self.items = []  # (item, future)
+        self.ready = False
+
+
+def _run_batch(key, seeds):
+    """
+    Generates the maze of each seed for a batch, in a worker process.
+    Returns mazefile records, or paths for "solve".
+    """
+    kind, maze_type, algorithm, width, height = key
+    results = []
+    for seed in seeds:
+        maze = mazelib.maze_types[maze_type](width, height)
+        mazelib.generators[algorithm](maze, rng=maze_rng(seed, 0)).generate()
+        if kind == "solve":
+            results.append(solve.solve(maze).tolist())
+        else:
+            results.append(mazefile.encode(maze, seed=seed))
+    return results
+
+
+class _ChunkQueue():
+    """
+    Binary or text file object for rendering in a thread, which hands the
+    output to the event loop in RENDER_CHUNK pieces through `queue`,
+    waiting while it is full. None is queued once closed.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(RENDER_QUEUE)
+        self.buffer = bytearray()
+        self.cancelled = False
+
+    def write(self, data):
+        if self.cancelled:
+            raise ConnectionError("Render cancelled")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.buffer += data
+        if len(self.buffer) >= RENDER_CHUNK:
+            self._put(bytes(self.buffer))
+            self.buffer.clear()
+
+    def close(self):
+        if self.buffer and not self.cancelled:
+            self._put(bytes(self.buffer))
+        self._put(None)
+
+    def _put(self, chunk):
+        asyncio.run_coroutine_threadsafe(self.queue.put(chunk), self.loop).result()
+
+
+########## Requests and responses ##########
+
+def parse_params(query, max_cells):
+    """
+    Returns the maze parameters in a query string, with defaults filled in
+    and a random seed if none is given. Raises ValueError if they are
+    invalid.
+    """
+    query = dict(urllib.parse.parse_qsl(query))
+    params = {
+        "type": query.get("type", "rect"),
+        "algorithm": query.get("algorithm", "backtrack"),
+        "width": _int_param(query, "width", 50, 1),
+        "height": _int_param(query, "height", 30, 1),
+        "seed": _int_param(query, "seed", None, 0, MAX_SEED),
+        "format": query.get("format", "text"),
+        "cell_size": _int_param(query, "cell_size", 8, 2),
+    }
+    if params["type"] not in mazelib.maze_types:
+        raise ValueError("Unknown maze type: {}".format(params["type"]))
+    if params["algorithm"] not in mazelib.generators:
+        raise ValueError("Unknown algorithm: {}".format(params["algorithm"]))
+    supported = mazelib.generators[params["algorithm"]].supported_maze_types
+    if supported is not None and params["type"] not in supported:
+        raise ValueError("Algorithm {} only supports maze types: {}".format(
+            params["algorithm"], ", ".join(supported)
+        ))
+    maze_cls = mazelib.maze_types[params["type"]]
+    if params["height"] < maze_cls.min_height:
+        raise ValueError("{} mazes need a height of at least {}".format(
+            params["type"], maze_cls.min_height
+        ))
+    if params["width"] * params["height"] > max_cells:
+        raise ValueError("Mazes can have at most {} cells".format(max_cells))
+    if params["format"] not in ("text", "png"):
+        raise ValueError("Unknown format: {}".format(params["format"]))
+    if params["cell_size"] > MAX_CELL_SIZE:
+        raise ValueError("cell_size can be at most {}".format(MAX_CELL_SIZE))
+    pixels = params["width"] * params["height"] * params["cell_size"]**2
+    if params["format"] == "png" and pixels > MAX_PIXELS:
+        raise ValueError("Images can have at most about {} pixels".format(MAX_PIXELS))
+    if params["seed"] is None:
+        params["seed"] = random.getrandbits(63)
+    return params
+
+def _int_param(query, name, default, minimum, maximum=None):
+    if name not in query:
+        return default
+    try:
+        value = int(query[name])
+    except ValueError:
+        raise ValueError("{} must be an integer".format(name)) from None
+    if value < minimum:
+        raise ValueError("{} must be at least {}".format(name, minimum))
+    if maximum is not None and value > maximum:
+        raise ValueError("{} must be at most {}".format(name, maximum))
+    return value
+
+def _describe(params):
+    return {key: params[key] for key in ("type", "algorithm", "width", "height", "seed")}
+
+async def _read_request(reader):
+    """
+    Reads a request's head, returning `(method, target, keep_alive)`, or
+    None if the connection was closed first. Request bodies aren't
+    supported.
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    if len(line) > MAX_LINE:
+        raise ConnectionError("Request line too long")
+    method, target, version = line.decode("latin-1").split(None, 2)
+    version = version.strip()
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if len(line) > MAX_LINE:
+            raise ConnectionError("Header line too long")
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip().lower()
+    if "content-length" in headers or "transfer-encoding" in headers:
+        raise ConnectionError("Request bodies aren't supported")
+
+    connection = headers.get("connection", "")
+    if version == "HTTP/1.0":
+        keep_alive = connection == "keep-alive"
+    else:
+        keep_alive = connection != "close"
+    return method, target, keep_alive
+
+def _write_head(writer, status, content_type, keep_alive, headers=()):
+    lines = ["HTTP/1.1 {} {}".format(status, STATUS_TEXT[status])]
+    lines.append("Content-Type: " + content_type)
+    lines.append("Connection: " + ("keep-alive" if keep_alive else "close"))
+    lines += ["{}: {}".format(name, value) for name, value in headers]
+    writer.write("\r\n".join(lines + ["", ""]).encode("latin-1"))
+
+async def _send_json(writer, status, obj, keep_alive):
+    body = json.dumps(obj).encode("utf-8")
+    _write_head(writer, status, "application/json", keep_alive,
+                [("Content-Length", len(body))])
+    writer.write(body)
+    await writer.drain()
+
+
+########## Main ##########
+
+async def serve(host, port, workers, max_cells):
+    workers = workers or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        maze_server = MazeServer(executor, workers, max_cells)
+        server = await asyncio.start_server(maze_server.handle, host, port)
+        for sock in server.sockets:
+            print("Serving on http://{}:{}/".format(*sock.getsockname()[:2]),
+                  file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+            formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1",
+            help="Address to listen on.")
+    parser.add_argument("--port", "-p", default=8000, type=int,
+            help="Port to listen on.")
+    parser.add_argument("--workers", "-w", default=None, type=int,
+            help="Number of worker processes. Defaults to the number of CPUs.")
+    parser.add_argument("--max-cells", default=1 << 24, type=int,
+            help="Refuse mazes with more cells than this.")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_cells))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
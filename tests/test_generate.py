@@ -0,0 +1,58 @@
+import random
+import unittest
+
+import numpy
+
+import mazelib
+from mazelib.analyze import analyze
+from mazelib.generate import BULK_STEPS, DisjointSet
+
+
+class DisjointSetTest(unittest.TestCase):
+
+    def test_union_many_matches_union(self):
+        rng = numpy.random.default_rng(0)
+        for size, n_pairs in ((10, 5), (10, 30), (200, 50), (200, 500)):
+            one, many = DisjointSet(size), DisjointSet(size)
+            # A few rounds, so union_many() also starts from merged sets.
+            for _ in range(3):
+                a = rng.integers(0, size, n_pairs)
+                b = rng.integers(0, size, n_pairs)
+                expected = [one.union(x, y) for x, y in zip(a.tolist(), b.tolist())]
+                self.assertEqual(many.union_many(a, b).tolist(), expected)
+                self.assertEqual(self._partition(many), self._partition(one))
+
+    def test_union_many_empty(self):
+        sets = DisjointSet(5)
+        self.assertEqual(len(sets.union_many([], [])), 0)
+        self.assertEqual(sets.roots().tolist(), list(range(5)))
+
+    def _partition(self, sets):
+        groups = {}
+        for i, root in enumerate(sets.roots().tolist()):
+            groups.setdefault(root, []).append(i)
+        return sorted(groups.values())
+
+
+class KruskalTest(unittest.TestCase):
+
+    def test_batch_size(self):
+        # Batches of BULK_STEPS or more are run with union_many(), and
+        # must remove the same walls as one step at a time.
+        for maze_type in ("rect", "hex"):
+            mazes = []
+            for batch in (1, BULK_STEPS - 1, BULK_STEPS, 1000):
+                maze = mazelib.maze_types[maze_type](20, 15)
+                gen = mazelib.generators["kruskal"](maze, rng=random.Random(1))
+                gen.init()
+                while not gen.is_finished():
+                    gen.step_many(batch)
+                mazes.append(gen.finish())
+
+            self.assertTrue(analyze(mazes[0])["perfect"])
+            for maze in mazes[1:]:
+                numpy.testing.assert_array_equal(maze._cells, mazes[0]._cells)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import time
+import unittest
+import concurrent.futures
+
+from mazelib.batch import generate_many
+from mazelib.pool import MazePool
+
+
+class ImmediateExecutor(concurrent.futures.Executor):
+    """Runs tasks as they are submitted, so their futures are already done."""
+
+    def submit(self, func, *args):
+        future = concurrent.futures.Future()
+        future.set_result(func(*args))
+        return future
+
+
+class MazePoolTest(unittest.TestCase):
+
+    def test_refill_already_done(self):
+        # A refill that is done before its callback is added used to
+        # deadlock on the pool's lock.
+        with MazePool(workers=0) as pool:
+            pool.executor = ImmediateExecutor()
+            pool.set_stock("rect", "backtrack", 10, 10, 2)
+            self.assertEqual(pool.metrics()["stocked_mazes"], 2)
+            pool.get("rect", "backtrack", 10, 10)
+            metrics = pool.metrics()
+            self.assertEqual(metrics["stock_hits"], 1)
+            self.assertEqual(metrics["stocked_mazes"], 2)
+
+    def test_stock_without_workers(self):
+        # Refills finish quickly in a thread, and used to deadlock.
+        with MazePool(workers=0) as pool:
+            pool.set_stock("rect", "backtrack", 10, 10, 2)
+            for _ in range(5):
+                maze = pool.get("rect", "backtrack", 10, 10)
+                self.assertEqual(maze._cells.shape, (10, 10))
+            deadline = time.monotonic() + 10
+            while pool.metrics()["stocked_mazes"] < 2:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+            metrics = pool.metrics()
+            self.assertEqual(metrics["refill_errors"], 0)
+            self.assertGreaterEqual(metrics["refilled"], 2)
+
+    def test_stock_from_workers_read_only(self):
+        # Cells pickled back from a worker process used to be writable.
+        with MazePool(workers=1) as pool:
+            pool.set_stock("rect", "backtrack", 10, 10, 2)
+            deadline = time.monotonic() + 30
+            while pool.metrics()["stocked_mazes"] < 2:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+            maze = pool.get("rect", "backtrack", 10, 10)
+            self.assertEqual(pool.metrics()["stock_hits"], 1)
+            with self.assertRaises(ValueError):
+                maze._cells[0, 0] = 0
+            with self.assertRaises(ValueError):
+                maze._cells.flags.writeable = True
+
+    def test_seeded_cache(self):
+        with MazePool(max_bytes=2*10*10, workers=0) as pool:
+            maze = pool.get("rect", "kruskal", 10, 10, seed=5)
+            expected = generate_many("rect", "kruskal", 10, 10, 1, seed=5)[0]
+            self.assertTrue((maze._cells == expected).all())
+            with self.assertRaises(ValueError):
+                maze._cells[0, 0] = 0
+            for seed in range(3):
+                pool.get("rect", "kruskal", 10, 10, seed=seed)
+            metrics = pool.metrics()
+            self.assertEqual(metrics["cached_mazes"], 2)
+            self.assertEqual(metrics["evictions"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
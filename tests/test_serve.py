@@ -0,0 +1,23 @@
+import unittest
+
+import serve
+from mazelib import mazefile
+
+
+class ParseParamsTest(unittest.TestCase):
+
+    def test_seed_range(self):
+        # Seeds that don't fit in a mazefile record used to fail in the
+        # worker, as a 500, rather than as a bad request.
+        params = serve.parse_params("seed={}".format(serve.MAX_SEED), 10000)
+        self.assertEqual(params["seed"], serve.MAX_SEED)
+        record, = serve._run_batch(("generate", "rect", "backtrack", 5, 5), [params["seed"]])
+        self.assertEqual(mazefile.decode(record).seed, serve.MAX_SEED)
+
+        for seed in (-1, serve.MAX_SEED + 1):
+            with self.assertRaises(ValueError):
+                serve.parse_params("seed={}".format(seed), 10000)
+
+
+if __name__ == "__main__":
+    unittest.main()